@@ -0,0 +1,12 @@
+"""Helpers shared by the benchmarks."""
+import time
+
+
+def best_of(fn, runs=3):
+    """Fastest wall time of runs calls of fn, in seconds."""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
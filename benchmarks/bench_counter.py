@@ -0,0 +1,65 @@
+# run the benchmark by running `python -m benchmarks.bench_counter`
+"""Counter throughput benchmarks."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stool.logging_utils import Counter, ShardedCounter
+
+TOTAL_INCS = 400_000
+
+
+def incs_per_sec(counter, threads, total=TOTAL_INCS):
+    per_thread = total // threads
+
+    def worker():
+        inc = counter.inc
+        for _ in range(per_thread):
+            inc('total')
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        for future in [executor.submit(worker) for _ in range(threads)]:
+            future.result()
+        elapsed = time.perf_counter() - start
+    assert counter.get('total') == per_thread * threads
+    return per_thread * threads / elapsed
+
+
+def bench_threads():
+    print(f"{'threads':>8} {'Counter':>14} {'ShardedCounter':>16} {'speedup':>8}")
+    for threads in (1, 2, 4, 8, 16, 32, 64):
+        plain = incs_per_sec(Counter(), threads)
+        sharded = incs_per_sec(ShardedCounter(), threads)
+        print(f'{threads:>8} {plain:>12,.0f}/s {sharded:>14,.0f}/s {sharded / plain:>7.2f}x')
+
+
+def bench_per_item(items=100_000, threads=8):
+    deltas = {'total': 1, 'ok': 1, 'bytes': 2048, 'pages': 3, 'links': 17, 'retries': 0, 'domain:example.com': 1}
+
+    def loop_inc(counter):
+        inc = counter.inc
+        for _ in range(items // threads):
+            for key, value in deltas.items():
+                inc(key, value)
+
+    def loop_inc_many(counter):
+        inc_many = counter.inc_many
+        for _ in range(items // threads):
+            inc_many(deltas)
+
+    print(f"\nper-item overhead, {len(deltas)} keys per item, {threads} threads")
+    for cls in (Counter, ShardedCounter):
+        for loop in (loop_inc, loop_inc_many):
+            counter = cls()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                start = time.perf_counter()
+                for future in [executor.submit(loop, counter) for _ in range(threads)]:
+                    future.result()
+                elapsed = time.perf_counter() - start
+            assert counter.get('total') == items // threads * threads
+            print(f'{cls.__name__:>14}.{loop.__name__[5:]:<9} {elapsed / items * 1e6:>7.2f} us/item')
+
+
+if __name__ == '__main__':
+    bench_threads()
+    bench_per_item()
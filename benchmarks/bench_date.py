@@ -0,0 +1,84 @@
+# run the benchmark by running `python -m benchmarks.bench_date`
+"""date_utils benchmarks."""
+from datetime import date
+
+from benchmarks._util import best_of
+from stool.date_utils import (_parse_date_cached, generate_time_ranges, iter_time_ranges, parse_date, parse_dates,
+                              time_range_ordinals, tz_it, tz_it_many)
+
+
+def bench_time_ranges(start='1994-01-01', end='2023-12-31'):
+    print(f'time ranges {start} .. {end}, best of 5, ms')
+    print(f"{'interval':>10} {'ranges':>7} {'generate':>9} {'iter str':>9} {'iter date':>10} {'ordinals':>9}")
+    for interval in ('daily', 'weekly', 7, 'monthly', 'quarterly', 'yearly'):
+        n = len(generate_time_ranges(start, end, interval))
+        timings = [
+            best_of(lambda: generate_time_ranges(start, end, interval), 5),
+            best_of(lambda: list(iter_time_ranges(start, end, interval)), 5),
+            best_of(lambda: list(iter_time_ranges(start, end, interval, as_type=date)), 5),
+            best_of(lambda: time_range_ordinals(start, end, interval), 5),
+        ]
+        print(f'{interval!s:>10} {n:>7} ' + ' '.join(f'{t * 1000:>9.2f}' for t in timings))
+
+
+def bench_parse_date(n=20_000):
+    from datetime import datetime, timedelta
+    from dateutil import parser as dateutil_parser
+
+    base = datetime(2024, 1, 1)
+    unique = [(base + timedelta(seconds=37 * i)).isoformat() for i in range(n)]
+    repeated = unique[:200] * (n // 200)
+    print(f'\nparse {n:,} ISO-8601 strings, best of 3, ms')
+    print(f"{'strings':>10} {'dateutil':>9} {'parse_date':>11} {'parse_dates':>12} {'hit rate':>9}")
+    for name, strs in (('unique', unique), ('repeated', repeated)):
+        stats = {}
+        timings = [
+            best_of(lambda: [tz_it(dateutil_parser.parse(s)) for s in strs], 3),
+            best_of(lambda: (_parse_date_cached.cache_clear(), [parse_date(s) for s in strs]), 3),
+            best_of(lambda: (_parse_date_cached.cache_clear(), parse_dates(strs, stats=stats)), 3),
+        ]
+        print(f'{name:>10} ' + ' '.join(f'{t * 1000:>{w}.2f}' for t, w in zip(timings, (9, 11, 12)))
+              + f" {stats['hit_rate']:>9.1%}")
+
+
+def bench_infer_format(n=20_000):
+    from datetime import datetime, timedelta
+
+    base = datetime(2024, 1, 1)
+    print(f'\nparse {n:,} unique strings of one format, ms')
+    print(f"{'format':>30} {'parse_date':>11} {'infer_format':>13}")
+    for fmt in ('%Y-%m-%dT%H:%M:%S', '%m/%d/%Y %H:%M:%S', '%a, %d %b %Y %H:%M:%S +0000', '%Y-%m-%d %H:%M:%S +0800'):
+        strs = [(base + timedelta(seconds=3697 * i)).strftime(fmt) for i in range(n)]
+        timings = [
+            best_of(lambda: (_parse_date_cached.cache_clear(), [parse_date(s) for s in strs]), 1),
+            best_of(lambda: parse_dates(strs, infer_format=True), 3),
+        ]
+        print(f'{fmt:>30} {timings[0] * 1000:>11.2f} {timings[1] * 1000:>13.2f}')
+
+
+def bench_tz_it_many(n=200_000):
+    import random
+    from datetime import datetime, timezone
+
+    random.seed(1)
+    epochs = [random.randint(946684800, 1893456000) for _ in range(n)]  # 2000 .. 2030
+    dts = [datetime.fromtimestamp(e, timezone.utc) for e in epochs]
+    try:
+        import numpy  # noqa: F401
+        outputs = ('datetime', 'epoch', 'datetime64')
+    except ImportError:
+        outputs = ('datetime', 'epoch')
+    print(f'\nconvert {n:,} values spread over 30 years, ms')
+    print(f"{'tz':>18} {'tz_it loop':>11} " + ' '.join(f'{o:>11}' for o in outputs))
+    for tz in ('America/New_York', 'Asia/Shanghai', 'UTC'):
+        loop = best_of(lambda: [tz_it(d, tz) for d in dts], 1)
+        bulk = [best_of(lambda: tz_it_many(dts if output == 'datetime' else epochs, tz, output), 1)
+                for output in outputs]
+        print(f'{tz:>18} {loop * 1000:>11.0f} ' + ' '.join(f'{t * 1000:>11.0f}' for t in bulk))
+
+
+if __name__ == '__main__':
+    bench_time_ranges()
+    bench_parse_date()
+    bench_infer_format()
+    bench_tz_it_many()
@@ -0,0 +1,50 @@
+# run the benchmark by running `python -m benchmarks.bench_datetime_decoder`
+"""
+DateTimeDecoder on text-heavy documents: try/except on every string vs the ISO shape pre-check vs a key allow-list.
+"""
+import json
+from datetime import datetime
+
+from benchmarks._util import best_of
+from stool.misc_utils import DateTimeDecoder
+
+
+def _old_decode_datetime(obj):
+    """DateTimeDecoder._decode_datetime before the pre-check: fromisoformat on every string value."""
+    for key, value in obj.items():
+        if isinstance(value, str):
+            try:
+                obj[key] = datetime.fromisoformat(value)
+            except ValueError:
+                pass  # Not a datetime string
+    return obj
+
+
+def make_text(records=20_000):
+    docs = [{'id': i, 'url': f'https://example.com/articles/{i}', 'title': f'Article number {i}',
+             'author': {'name': f'Writer {i % 97}', 'email': f'writer{i % 97}@example.com', 'bio': 'Writes things.'},
+             'body': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3, 'lang': 'en',
+             'tags': [{'name': t, 'slug': t.lower()} for t in ('News', 'Tech', 'Opinion')],
+             'sku': f'{i:012}', 'published': datetime(2024, 1, 1, i % 24).isoformat()} for i in range(records)]
+    return json.dumps(docs)
+
+
+def bench():
+    text = make_text()
+    expected = json.loads(text, object_hook=_old_decode_datetime)
+    runs = (('try/except every string', lambda: json.loads(text, object_hook=_old_decode_datetime)),
+            ('shape pre-check', lambda: json.loads(text, cls=DateTimeDecoder)),
+            ("keys={'published'}", lambda: DateTimeDecoder(keys={'published'}).decode(text)),
+            ('no datetime decoding', lambda: json.loads(text)))
+    print(f'{len(text) / 1024 / 1024:.1f} MB of text-heavy JSON')
+    baseline = None
+    for name, run in runs:
+        if name != 'no datetime decoding':
+            assert run() == expected
+        elapsed = best_of(run)
+        baseline = baseline or elapsed
+        print(f'{name:>26} {elapsed * 1000:>8.1f} ms {baseline / elapsed:>6.2f}x')
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,54 @@
+# run the benchmark by running `python -m benchmarks.bench_deep_get`
+"""Looped deep_get() vs compiled paths vs deep_get_columns() over API-style records."""
+
+from benchmarks._util import best_of
+from stool.misc_utils import compile_path, deep_get, deep_get_columns
+
+PATHS = ['data.id', 'data.attributes.title', 'data.attributes.author.name', 'data.meta.stats.views',
+         'data.attributes.missing']
+
+
+def _old_deep_get(dictionary, keys, default=None):
+    """deep_get() before compiled paths: split on every call, dicts only."""
+    if not dictionary:
+        return default
+
+    if isinstance(keys, str):
+        keys = keys.split('.')
+
+    if keys and isinstance(keys, list):
+        for key in keys:
+            if isinstance(dictionary, dict) and key in dictionary:
+                dictionary = dictionary[key]
+            else:
+                return default
+        return dictionary if None != dictionary else default
+
+    return default
+
+
+def make_records(n=200_000):
+    return [{'data': {'id': i, 'attributes': {'title': f'Title {i}', 'author': {'name': f'author {i % 50}'}},
+                      'meta': {'stats': {'views': i * 3}}, 'links': [{'href': f'/items/{i}'}]}} for i in range(n)]
+
+
+def bench():
+    records = make_records()
+    compiled = [compile_path(p) for p in PATHS]
+    runs = (('old deep_get, looped', lambda: {p: [_old_deep_get(r, p) for r in records] for p in PATHS}),
+            ('deep_get, looped', lambda: {p: [deep_get(r, p) for r in records] for p in PATHS}),
+            ('compiled paths, looped', lambda: {c.path: [c.get(r) for r in records] for c in compiled}),
+            ('deep_get_columns', lambda: deep_get_columns(records, PATHS)))
+    expected = runs[0][1]()
+    lookups = len(records) * len(PATHS)
+    print(f'{len(records):,} records x {len(PATHS)} paths')
+    baseline = None
+    for name, run in runs:
+        assert run() == expected
+        elapsed = best_of(run)
+        baseline = baseline or elapsed
+        print(f'{name:>24} {lookups / elapsed:>12,.0f} lookups/s {baseline / elapsed:>6.2f}x')
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,73 @@
+# run the benchmark by running `python -m benchmarks.bench_del_by_size [files]`
+"""
+del_by_size() traversal benchmark on a synthetic cache tree (1M small files by default, ~4GB of inodes: be patient).
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from stool.misc_utils import del_by_size
+
+
+def _old_del_by_size(directory, ext='.html', min_size=3 * 1024):
+    """del_by_size() before scandir: os.walk, then isfile + getsize per file."""
+    total = 0
+    total_size = 0
+    deleted = 0
+    deleted_size = 0
+    for root, dirs, files in os.walk(directory):
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            if os.path.isfile(file_path) and file_path.endswith(ext):
+                total += 1
+                file_size = os.path.getsize(file_path)
+                total_size += file_size
+                if file_size < min_size:
+                    deleted += 1
+                    deleted_size += file_size
+                    os.remove(file_path)
+    return total, total_size, deleted, deleted_size
+
+
+def make_tree(root, files, per_dir=1000, fan_out=32):
+    """files small .html files (plus one .txt per directory), per_dir per leaf, leaves spread over fan_out parents."""
+    payload = b'<html></html>'
+    for d in range(files // per_dir):
+        path = os.path.join(root, f'{d % fan_out:02}', f'{d:05}')
+        os.makedirs(path)
+        for i in range(per_dir):
+            with open(os.path.join(path, f'{i}.html'), 'wb') as f:
+                f.write(payload)
+        with open(os.path.join(path, 'index.txt'), 'wb') as f:
+            f.write(payload)
+
+
+def bench(files=1_000_000):
+    root = tempfile.mkdtemp(prefix='bench_del_by_size_')
+    try:
+        start = time.perf_counter()
+        make_tree(root, files)
+        print(f'created {files:,} files in {time.perf_counter() - start:.1f}s')
+
+        # min_size=0 deletes nothing, every run scans the same tree (warm page cache after the first one)
+        runs = [('os.walk + isfile + getsize', lambda: _old_del_by_size(root, min_size=0))]
+        runs += [(f'scandir, {w} worker(s)', lambda w=w: del_by_size(root, min_size=0, workers=w))
+                 for w in (1, 4, 8, 16)]
+        runs += [('scandir, dry_run', lambda: del_by_size(root, dry_run=True))]
+        _old_del_by_size(root, min_size=0)  # warm up
+        baseline = None
+        print(f"{'':>28} {'seconds':>8} {'files/s':>12} {'speedup':>8}")
+        for name, run in runs:
+            start = time.perf_counter()
+            total = run()[0]
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f'{name:>28} {elapsed:>8.2f} {total / elapsed:>12,.0f} {baseline / elapsed:>7.2f}x')
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
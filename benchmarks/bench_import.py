@@ -0,0 +1,44 @@
+# run the benchmark by running `python -m benchmarks.bench_import`
+"""Import-time benchmark: what does `import stool; stool.Counter` actually load?"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('pymongo', 'bson', 'requests', 'urllib3', 'dateutil', 'pytz')
+
+
+def import_time(code):
+    """Run `code` with `-X importtime` in a fresh interpreter, return {module: cumulative_us} of top-level imports."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # nested imports are already in their parent's cumulative time
+            modules[name.strip()] = int(cumulative)
+        else:
+            modules.setdefault(name.strip(), 0)
+    return modules
+
+
+if __name__ == '__main__':
+    cases = [
+        'import stool',
+        'import stool; stool.Counter',
+        'import stool; stool.generate_time_ranges',
+        'import stool; stool.StatusMonitor',
+    ]
+    baseline = import_time('pass')
+    for code in cases:
+        modules = import_time(code)
+        elapsed = sum(modules.values()) - sum(baseline.values())
+        heavy = sorted({m.split('.')[0] for m in modules} & set(HEAVY))
+        print(f'{code:<45} {elapsed / 1000:>8.1f} ms  modules: {len(modules) - len(baseline):>4}'
+              f'  heavy: {", ".join(heavy) or "-"}')
+
+    loaded = {m.split('.')[0] for m in import_time('import stool; stool.Counter')}
+    assert not loaded & {'pymongo', 'bson', 'requests'}, loaded & {'pymongo', 'bson', 'requests'}
+    print('OK: `import stool; stool.Counter` does not import pymongo or requests')
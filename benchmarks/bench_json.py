@@ -0,0 +1,44 @@
+# run the benchmark by running `python -m benchmarks.bench_json`
+"""to_json/from_json/CustomJSONEncoder throughput per installed JSON backend, on large nested documents."""
+import json
+from datetime import datetime, timedelta
+
+from benchmarks._util import best_of
+from stool.misc_utils import CustomJSONEncoder, from_json, set_json_backend, to_json
+
+
+def make_docs(records=20_000):
+    return [{'id': i, 'url': f'https://example.com/items/{i}', 'title': f'商品 {i} "special" offer',
+             'price': i * 1.2345, 'tags': ['new', 'sale', str(i % 7)], 'updated': datetime(2024, 1, 1, i % 24, i % 60),
+             'stats': {'views': i * 31, 'ratio': i / 7, 'ok': i % 3 == 0, 'last': None,
+                       'history': [{'day': d, 'count': i + d} for d in range(5)]}} for i in range(records)]
+
+
+def bench():
+    docs = make_docs()
+    with_durations = [{**d, 'elapsed': timedelta(seconds=d['id'])} for d in docs]
+    text = to_json(docs)
+    mb = len(text.encode()) / 1024 / 1024
+    print(f'{len(docs):,} records, {mb:.1f} MB of JSON')
+    runs = (('to_json', lambda: to_json(docs)),
+            ('CustomJSONEncoder', lambda: json.dumps(with_durations, cls=CustomJSONEncoder, indent=2)),
+            ('CustomJSONEncoder, utf-8', lambda: json.dumps(with_durations, cls=CustomJSONEncoder, indent=2,
+                                                            ensure_ascii=False)),
+            ('from_json', lambda: from_json(text)))
+    print(f"{'':>26} {'backend':>8} {'MB/s':>8} {'speedup':>8}")
+    for title, run in runs:
+        baseline = None
+        for name in ('json', 'orjson'):
+            try:
+                set_json_backend(name)
+            except ImportError:
+                print(f'{title:>26} {name:>8} not installed')
+                continue
+            elapsed = best_of(run)
+            baseline = baseline or elapsed
+            print(f'{title:>26} {name:>8} {mb / elapsed:>8.1f} {baseline / elapsed:>7.1f}x')
+    set_json_backend()
+
+
+if __name__ == '__main__':
+    bench()
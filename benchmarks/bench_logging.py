@@ -0,0 +1,56 @@
+# run the benchmark by running `python -m benchmarks.bench_logging`
+"""Logging formatter throughput benchmarks."""
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import colorlog
+from colorama import Fore
+
+from stool.logging_utils import _RESET_COLOR, _THREAD_COLORS, _ThreadColorFormatter, get_thread_number
+
+RECORDS = 100_000
+
+
+class _OldThreadColorFormatter(colorlog.ColoredFormatter):
+    """The formatter before the per-thread color cache: rewrites record.msg and re-parses the thread name."""
+
+    def format(self, record):
+        thread_number = get_thread_number()
+        color = Fore.WHITE if thread_number < 0 else _THREAD_COLORS[thread_number % len(_THREAD_COLORS)]
+        record.msg = f"{color}{record.msg}{_RESET_COLOR}"
+        return super().format(record)
+
+
+def records_per_sec(formatter, fmt, threads, total=RECORDS):
+    logger = logging.Logger(f'bench-{id(formatter)}')
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(formatter(fmt=fmt, reset=True))
+    logger.addHandler(handler)
+    per_thread = total // threads
+
+    def worker():
+        for i in range(per_thread):
+            logger.info('processed %s items', i)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        for future in [executor.submit(worker) for _ in range(threads)]:
+            future.result()
+        elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def bench_formatters():
+    old_fmt = "%(log_color)s%(asctime)s %(levelname)s - [%(name)s] - %(message)s"
+    new_fmt = f"%(log_color)s%(asctime)s %(levelname)s - [%(name)s] - %(thread_color)s%(message)s{_RESET_COLOR}"
+    print(f"{'threads':>8} {'old':>14} {'new':>14} {'speedup':>8}")
+    for threads in (1, 16):
+        old = records_per_sec(_OldThreadColorFormatter, old_fmt, threads)
+        new = records_per_sec(_ThreadColorFormatter, new_fmt, threads)
+        print(f'{threads:>8} {old:>12,.0f}/s {new:>12,.0f}/s {new / old:>7.2f}x')
+
+
+if __name__ == '__main__':
+    bench_formatters()
@@ -0,0 +1,35 @@
+# run the benchmark by running `python -m benchmarks.bench_status_monitor`
+"""StatusMonitor round-trip benchmarks, against the in-process fake client in tests.fakes."""
+from datetime import datetime
+
+import pytz
+
+from stool.status_monitor import CAT_SERVICE_STATUS, StatusMonitor
+from tests.fakes import FakeMongoClient
+
+
+def _old_save_status(monitor, service_name, status='running'):
+    """save_status() before $setOnInsert: a find_one to decide whether start_time must be written."""
+    collection = monitor.mdb['reeval']['status_monitor']
+    data = {'service': service_name, 'status': status}
+    if not collection.find_one({'_id': monitor.status_id}):
+        data['start_time'] = datetime.fromtimestamp(monitor.start_timestamp, tz=pytz.utc)
+    monitor.save(CAT_SERVICE_STATUS, data, monitor.status_id)
+
+
+def bench_heartbeat_round_trips(heartbeats=1000):
+    print(f"{'save_status':>24} {'round-trips':>12} {'per heartbeat':>14}")
+    for name, beat, kwargs in (('find_one + update_one', _old_save_status, {}),
+                               ('$setOnInsert', StatusMonitor.save_status, {}),
+                               ('$setOnInsert, buffered', StatusMonitor.save_status, {'write_behind': True})):
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True, flush_interval=3600, **kwargs)
+        for _ in range(heartbeats):
+            beat(monitor, 'crawler')
+        monitor.close()
+        calls = len(client['reeval']['status_monitor'].calls)
+        print(f'{name:>24} {calls:>12,} {calls / heartbeats:>14.3f}')
+
+
+if __name__ == '__main__':
+    bench_heartbeat_round_trips()
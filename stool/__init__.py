@@ -1,4 +1,51 @@
-from .misc_utils import *
-from .date_utils import *
-from .logging_utils import *
-from .status_monitor import *
\ No newline at end of file
+"""
+Submodules are imported on first attribute access, so `import stool` stays cheap and
+`stool.Counter` never pulls in pymongo or requests.
+"""
+import importlib
+
+_SUBMODULES = ('misc_utils', 'date_utils', 'logging_utils', 'status_monitor')
+
+# public name -> submodule that provides it (same names the old star imports exposed)
+_EXPORTS = {
+    **dict.fromkeys((
+        'deprecated', 'expand_config_file', 'expand_dir', 'file_exists_and_not_empty', 'save_json', 'load_json',
+        'JsonlWriter', 'save_jsonl', 'iter_jsonl', 'send_msg', 'Notifier', 'get_md5', 'del_by_size', 'exclude_keyword',
+        'exclude_keys', 'reserve_keyword', 'reserve_keys', 'KeyProjection', 'deep_get', 'DeepPath', 'compile_path',
+        'deep_get_columns', 'DateTimeEncoder', 'DateTimeDecoder', 'to_json', 'from_json', 'CustomJSONEncoder',
+        'set_json_backend', 'get_json_backend',
+        'functools', 'hashlib', 'json', 'logging', 'os', 'sys', 'warnings', 'datetime', 'timedelta', 'Dict', 'List',
+    ), 'misc_utils'),
+    **dict.fromkeys((
+        'first_day_of_month', 'last_day_of_month', 'split_into_months', 'generate_time_ranges', 'iter_time_ranges',
+        'time_range_ordinals', 'tz_it', 'tz_it_many', 'parse_date', 'parse_dates', 'infer_date_format', 'ISO8601',
+        'timezone',
+    ), 'date_utils'),
+    **dict.fromkeys((
+        'sec2str', 'sec2str_hms', 'get_thread_number', 'print_cmd', 'printc', 'print_and_return', 'print_progress',
+        'flush_logger', 'get_colored_logger', 'Counter', 'ShardedCounter', 'Histogram',
+        'threading', 'time', 'colorlog', 'Fore',
+    ), 'logging_utils'),
+    **dict.fromkeys((
+        'CAT_SERVICE_STATUS', 'StatusMonitor', 'get_mongo_client', 'close_mongo_clients',
+        'CounterExporter',
+        'pymongo', 'pytz', 'dateutil_parser', 'ObjectId',
+    ), 'status_monitor'),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value  # cache it, later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
@@ -1,4 +1,10 @@
-from datetime import datetime, timedelta
+import bisect
+import functools
+import logging
+import math
+import re
+from array import array
+from datetime import date, datetime, timedelta, timezone
 
 
 def first_day_of_month(any_day):
@@ -85,10 +91,101 @@ def generate_time_ranges(start_date, end_date, interval='monthly'):
     return ranges
 
 
-from dateutil import parser as dateutil_parser
-import pytz
-from datetime import datetime, timezone, timedelta
-import logging
+_INTERVAL_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+
+def _interval_days(interval):
+    if interval == 'weekly':
+        return 7
+    if interval == 'daily':
+        return 1
+    if isinstance(interval, int) or interval.isdigit():
+        return max(int(interval), 1)
+    return None
+
+
+def _to_date(d):
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    return datetime.strptime(d, '%Y-%m-%d').date()
+
+
+def _iter_range_ordinals(start, end, interval):
+    """Yield (first, last) day ordinals of every range, same intervals as generate_time_ranges."""
+    first, last = start.toordinal(), end.toordinal()
+    months = _INTERVAL_MONTHS.get(interval)
+    if months:
+        year, month = start.year, start.month
+        while first <= last:
+            month = (month - 1) // months * months + months  # last month of the period
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            period_last = date(year, month, 1).toordinal() - 1
+            yield first, min(period_last, last)
+            first = period_last + 1
+        return
+
+    days = _interval_days(interval)
+    if days is None:
+        yield first, last
+        return
+    for day in range(first, last + 1, days):
+        yield day, min(day + days - 1, last)
+
+
+def iter_time_ranges(start_date, end_date, interval='monthly', as_type=str):
+    """Lazy generate_time_ranges().
+
+    Args:
+        start_date (str, date or datetime): Start date, strings in "yyyy-MM-dd" format.
+        end_date (str, date or datetime): End date, strings in "yyyy-MM-dd" format.
+        interval (str or int): Same as generate_time_ranges().
+        as_type: Type of the yielded boundaries, str ("yyyy-MM-dd"), date or datetime (midnight).
+
+    Yields:
+        tuple: (start, end) of each range, both inclusive.
+    """
+    if as_type is str:
+        convert = lambda o: date.fromordinal(o).isoformat()
+    elif as_type is date:
+        convert = date.fromordinal
+    elif as_type is datetime:
+        convert = datetime.fromordinal
+    else:
+        raise ValueError(f'Unsupported as_type {as_type}, expected str, date or datetime')
+
+    for first, last in _iter_range_ordinals(_to_date(start_date), _to_date(end_date), interval):
+        yield convert(first), convert(last)
+
+
+def time_range_ordinals(start_date, end_date, interval='monthly'):
+    """Bulk generate_time_ranges(): all boundaries computed in one pass, as day ordinals.
+
+    Returns:
+        tuple: (starts, ends), two array('l') of proleptic Gregorian ordinals (date.fromordinal() converts them),
+               ends inclusive.
+    """
+    start, end = _to_date(start_date), _to_date(end_date)
+    days = None if interval in _INTERVAL_MONTHS else _interval_days(interval)
+    if days:
+        first, last = start.toordinal(), end.toordinal()
+        starts = array('l', range(first, last + 1, days))
+        ends = array('l', range(first + days - 1, last + days, days))
+        if ends:
+            ends[-1] = min(ends[-1], last)
+        return starts, ends
+
+    ranges = list(_iter_range_ordinals(start, end, interval))
+    return array('l', [r[0] for r in ranges]), array('l', [r[1] for r in ranges])
+
+
+@functools.lru_cache(maxsize=256)
+def _get_timezone(tz):
+    import pytz  # lazy: only needed for named zones
+
+    return pytz.timezone(tz)
+
 
 def tz_it(d, tz=None):
     """
@@ -108,7 +205,7 @@ def tz_it(d, tz=None):
     tzz = timezone.utc
     if isinstance(tz, str):
         try:
-            tzz = pytz.timezone(tz)
+            tzz = _get_timezone(tz)
         except Exception as e:
             logging.exception(f"Failed to get timezone {tz}: {e}")
 
@@ -119,11 +216,137 @@ def tz_it(d, tz=None):
     return d.astimezone(tzz)
 
 
-def parse_date(date_str, date_format=None):
-    """解析日期字符串为 datetime 对象"""
-    if not date_str:
-        return None
+_EPOCH = datetime(1970, 1, 1)
+_DAY = 86400
+
+
+def _offset_table(tzinfo, first, last):
+    """
+    UTC offset periods of tzinfo between two epoch seconds: sorted period starts (epoch seconds) and matching
+    (offset_seconds, offset, tzinfo of the period). Found by probing daily and bisecting down to the second.
+    """
+    def probe(t):
+        local = datetime.fromtimestamp(t, tzinfo)
+        offset = local.utcoffset()
+        return int(offset.total_seconds()), offset, local.tzinfo  # pytz hands out a tzinfo per period
+
+    t = math.floor(first)
+    starts, periods = [t], [probe(t)]
+    while t < last:
+        next_t = min(t + _DAY, math.ceil(last))
+        period = probe(next_t)
+        if period != periods[-1]:  # the offset changes in (t, next_t]
+            lo, hi = t, next_t
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if probe(mid) == periods[-1]:
+                    lo = mid
+                else:
+                    hi = mid
+            starts.append(hi)
+            periods.append(probe(hi))
+        t = next_t
+    return starts, periods
+
+
+def tz_it_many(values, tz=None, output='datetime'):
+    """
+    Bulk tz_it(): convert datetimes (naive ones are taken as UTC) or epoch seconds to a timezone.
+
+    The UTC offsets of tz over the span of the values are worked out once, so each value only costs a lookup and
+    an addition instead of a full astimezone().
+    Args:
+        values: sequence of datetime objects or epoch seconds, None is passed through
+        tz: timezone string (e.g., 'UTC', 'Asia/Shanghai'), UTC if not given
+        output: 'datetime' for datetime objects with the timezone, 'epoch' for the local wall-clock time as seconds
+                since 1970-01-01 (no objects are created) or 'datetime64' for a numpy datetime64[us] array of the
+                local wall-clock times (needs numpy, None becomes NaT)
+    Returns:
+        list, or numpy array for 'datetime64'
+    """
+    if output not in ('datetime', 'epoch', 'datetime64'):
+        raise ValueError(f"Unknown output {output!r}, expected 'datetime', 'epoch' or 'datetime64'")
+
+    tzz = timezone.utc
+    if isinstance(tz, str):
+        try:
+            tzz = _get_timezone(tz)
+        except Exception as e:
+            logging.exception(f"Failed to get timezone {tz}: {e}")
 
+    # naive UTC datetimes or epoch seconds, whichever the value came as
+    keys = [v.replace(tzinfo=None) - v.utcoffset() if isinstance(v, datetime) and v.tzinfo else v for v in values]
+
+    fixed = tzz.utcoffset(None)  # fixed offset zones (UTC, timezone(...)) answer without a datetime
+    starts, periods = [], []
+    if fixed is not None:
+        periods = [(int(fixed.total_seconds()), fixed, tzz)]
+    else:
+        dts = [k for k in keys if isinstance(k, datetime)]
+        nums = [k for k in keys if k is not None and not isinstance(k, datetime)]
+        bounds = nums + [(d - _EPOCH).total_seconds() for d in (min(dts), max(dts))] if dts else nums
+        if bounds and (max(bounds) - min(bounds)) / _DAY < len(dts) + len(nums):
+            starts, periods = _offset_table(tzz, min(bounds), max(bounds))
+        # else few values over a long span: probing would cost more than converting each value
+
+    if output == 'datetime64' and periods:
+        import numpy as np  # optional, only for datetime64 output
+
+        secs = np.array([np.nan if k is None else (k - _EPOCH).total_seconds() if isinstance(k, datetime) else k
+                         for k in keys], dtype='float64')
+        offsets = np.array([period[0] for period in periods], dtype='float64')
+        secs += offsets[np.maximum(np.searchsorted(starts, secs, side='right') - 1, 0)]  # NaN stays NaN
+        return _to_datetime64(np, secs)
+
+    start_dts = [_EPOCH + timedelta(seconds=t) for t in starts]
+    result = []
+    for k in keys:
+        if k is None:
+            result.append(None)
+            continue
+        is_dt = isinstance(k, datetime)
+        if len(periods) == 1:
+            offset, delta, tzi = periods[0]
+        elif periods:
+            offset, delta, tzi = periods[bisect.bisect_right(start_dts if is_dt else starts, k) - 1]
+        else:
+            local = k.replace(tzinfo=timezone.utc).astimezone(tzz) if is_dt else datetime.fromtimestamp(k, tzz)
+            delta = local.utcoffset()
+            offset, tzi = int(delta.total_seconds()), local.tzinfo
+        if output == 'datetime':
+            result.append(((k if is_dt else _EPOCH + timedelta(seconds=k)) + delta).replace(tzinfo=tzi))
+        else:
+            result.append(((k - _EPOCH).total_seconds() if is_dt else k) + offset)
+
+    if output != 'datetime64':
+        return result
+
+    import numpy as np
+
+    return _to_datetime64(np, np.array([np.nan if t is None else t for t in result], dtype='float64'))
+
+
+def _to_datetime64(np, secs):
+    """float seconds (NaN for missing) -> datetime64[us] array (NaT for missing)."""
+    missing = np.isnan(secs)
+    array64 = np.round(np.where(missing, 0, secs) * 1_000_000).astype('int64').astype('datetime64[us]')
+    array64[missing] = np.datetime64('NaT')
+    return array64
+
+
+def _parse_iso(date_str):
+    """datetime.fromisoformat() for the ISO-8601 shapes it parses the same as dateutil, None otherwise."""
+    if len(date_str) == 10 or (len(date_str) > 10 and date_str[10] in 'T '):
+        if date_str[-1] in 'Zz':
+            date_str = date_str[:-1] + '+00:00'
+        try:
+            return datetime.fromisoformat(date_str)
+        except ValueError:
+            return None
+    return None
+
+
+def _parse_date(date_str, date_format=None):
     if date_format:
         try:
             date_obj = datetime.strptime(date_str, date_format)
@@ -131,6 +354,13 @@ def parse_date(date_str, date_format=None):
         except Exception as e:
             logging.warning(f"Failed to parse date string {date_str} with format {date_format}: {e}")
 
+    if isinstance(date_str, str):
+        date_obj = _parse_iso(date_str)
+        if date_obj:
+            return tz_it(date_obj)
+
+    from dateutil import parser as dateutil_parser  # lazy: dateutil is slow to import
+
     try:
         date_obj = dateutil_parser.parse(date_str)
         return tz_it(date_obj)
@@ -138,3 +368,197 @@ def parse_date(date_str, date_format=None):
         logging.exception(f"Failed to parse date string {date_str}: {e}")
 
     return None
+
+
+# datetimes are immutable, repeated strings share the parsed result (failures are only logged the first time)
+_parse_date_cached = functools.lru_cache(maxsize=16384)(_parse_date)
+
+
+def parse_date(date_str, date_format=None):
+    """解析日期字符串为 datetime 对象 (UTC), ISO-8601 字符串走 fromisoformat 快速路径, 结果有 LRU 缓存"""
+    if not date_str:
+        return None
+    if not isinstance(date_str, str):
+        return _parse_date(date_str, date_format)
+    return _parse_date_cached(date_str, date_format)
+
+
+ISO8601 = 'iso8601'  # "format" of the strings datetime.fromisoformat() reads, see infer_date_format()
+
+# tried in order by infer_date_format(), after ISO8601
+_CANDIDATE_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%d %H:%M:%S%z', '%Y-%m-%d %H:%M:%S %z',
+    '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d',
+    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+    '%d.%m.%Y %H:%M:%S', '%d.%m.%Y', '%Y%m%d%H%M%S', '%Y%m%d',
+    '%a, %d %b %Y %H:%M:%S %z', '%a, %d %b %Y %H:%M:%S GMT', '%a %b %d %H:%M:%S %z %Y',
+    '%d %b %Y %H:%M:%S', '%d %b %Y', '%b %d, %Y', '%b %d %Y', '%d %B %Y', '%B %d, %Y',
+)
+
+_FORMAT_DIRECTIVES = {
+    'Y': r'(\d{4})', 'y': r'(\d{2})', 'm': r'(\d{1,2})', 'd': r'(\d{1,2})', 'H': r'(\d{1,2})', 'M': r'(\d{1,2})',
+    'S': r'(\d{1,2})', 'f': r'(\d{1,6})', 'b': r'([a-z]{3})', 'B': r'([a-z]+)', 'z': r'(z|[+-]\d{2}:?\d{2})',
+    'a': r'[a-z]{3}', 'A': r'[a-z]+',  # weekdays are matched, not used
+}
+_MONTHS = {name: i + 1 for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'))}
+_FULL_MONTHS = {name: i + 1 for i, name in enumerate(
+    ('january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+     'november', 'december'))}
+
+
+def _fields_to_datetime(fields):
+    if 'Y' in fields:
+        year = int(fields['Y'])
+    elif 'y' in fields:
+        year = int(fields['y'])
+        year += 2000 if year < 69 else 1900  # same pivot as strptime
+    else:
+        year = 1900
+    if 'm' in fields:
+        month = int(fields['m'])
+    elif 'b' in fields:
+        month = _MONTHS[fields['b'].lower()]
+    elif 'B' in fields:
+        month = _FULL_MONTHS[fields['B'].lower()]
+    else:
+        month = 1
+    tzinfo = None
+    if 'z' in fields:
+        z = fields['z'].replace(':', '')
+        if z in ('z', 'Z'):
+            tzinfo = timezone.utc
+        else:
+            offset = timedelta(hours=int(z[1:3]), minutes=int(z[3:5]))
+            tzinfo = timezone(-offset if z[0] == '-' else offset)
+    return datetime(year, month, int(fields.get('d', 1)), int(fields.get('H', 0)), int(fields.get('M', 0)),
+                    int(fields.get('S', 0)), int(fields.get('f', '0').ljust(6, '0')), tzinfo)
+
+
+def _compile_date_format(date_format):
+    """Return a parser for one format: str -> UTC datetime, or None when the string doesn't fit."""
+    if date_format == ISO8601:
+        def parse(date_str):
+            date_obj = _parse_iso(date_str)
+            return tz_it(date_obj) if date_obj else None
+        return parse
+
+    pattern, names, i = [], [], 0
+    while i < len(date_format):
+        c = date_format[i]
+        if c == '%' and i + 1 < len(date_format):
+            directive = date_format[i + 1]
+            i += 2
+            if directive == '%':
+                pattern.append('%')
+            elif directive in _FORMAT_DIRECTIVES:
+                pattern.append(_FORMAT_DIRECTIVES[directive])
+                if directive not in 'aA':
+                    names.append(directive)
+            else:  # directive without a hand-written rule, strptime does the work
+                def parse(date_str):
+                    try:
+                        return tz_it(datetime.strptime(date_str, date_format))
+                    except ValueError:
+                        return None
+                return parse
+        else:
+            pattern.append(r'\s+' if c.isspace() else re.escape(c))
+            i += 1
+    match = re.compile(''.join(pattern) + r'\Z', re.IGNORECASE).match
+
+    def parse(date_str):
+        m = match(date_str)
+        if m is None:
+            return None
+        try:
+            return tz_it(_fields_to_datetime(dict(zip(names, m.groups()))))
+        except (ValueError, KeyError):  # out of range values, unknown month names
+            return None
+
+    return parse
+
+
+def _parse_quietly(date_str):
+    """parse_date() without cache or log line, for batches that count their failures."""
+    date_obj = _parse_iso(date_str)
+    if date_obj is None:
+        from dateutil import parser as dateutil_parser
+
+        try:
+            date_obj = dateutil_parser.parse(date_str)
+        except (ValueError, OverflowError):
+            return None
+    return tz_it(date_obj)
+
+
+def infer_date_format(date_strs, sample_size=20):
+    """
+    Find the format shared by the first sample_size non-empty strings: ISO8601 (read by datetime.fromisoformat)
+    or a strptime format from a list of common ones. A format is only accepted if it gives the same datetime as
+    parse_date() for every sampled string parse_date() understands. Returns None if no format fits.
+    """
+    sample = []
+    for date_str in date_strs:
+        if date_str and isinstance(date_str, str):
+            sample.append(date_str)
+            if len(sample) >= sample_size:
+                break
+    expected = [(s, d) for s, d in ((s, _parse_quietly(s)) for s in sample) if d is not None]
+    if not expected:
+        return None
+    for date_format in (ISO8601,) + _CANDIDATE_FORMATS:
+        parse = _compile_date_format(date_format)
+        if all(parse(s) == d for s, d in expected):
+            return date_format
+    return None
+
+
+def parse_dates(date_strs, date_format=None, stats=None, infer_format=False, sample_size=20):
+    """
+    Parse many date strings with parse_date(), sharing its caches.
+
+    With infer_format=True the format is inferred once from the first sample_size strings (or taken from
+    date_format) and compiled into a dedicated parser; strings it can't read fall back to dateutil one by one,
+    and failures are counted instead of logged. Much faster on homogeneous columns.
+
+    Args:
+        date_strs: iterable of date strings
+        date_format: optional strptime format tried first, as in parse_date()
+        stats: optional dict (or Counter) that gets counts added: 'total' and 'cache_hits' ('hit_rate' is set),
+               or with infer_format 'total', 'fallbacks' and 'failed'
+        infer_format: infer and compile the format of the batch
+        sample_size: number of strings the format is inferred from
+    Returns:
+        list of datetime objects (None where parsing failed)
+    """
+    if infer_format:
+        date_strs = date_strs if isinstance(date_strs, list) else list(date_strs)
+        date_format = date_format or infer_date_format(date_strs, sample_size)
+        parse = _compile_date_format(date_format) if date_format else lambda s: None
+        result, fallbacks, failed, seen = [], 0, 0, {}
+        for s in date_strs:
+            if s in seen:  # a column often repeats its values
+                result.append(seen[s])
+                continue
+            date_obj = parse(s) if s and isinstance(s, str) else None
+            if date_obj is None and s:
+                fallbacks += 1
+                date_obj = _parse_quietly(s) if isinstance(s, str) else None
+                failed += date_obj is None
+            seen[s] = date_obj
+            result.append(date_obj)
+        if stats is not None:
+            for key, value in (('total', len(result)), ('fallbacks', fallbacks), ('failed', failed)):
+                stats[key] = stats.get(key, 0) + value
+        return result
+
+    before = _parse_date_cached.cache_info().hits
+    result = [parse_date(s, date_format) for s in date_strs]
+    if stats is not None:
+        # read from the shared cache, so concurrent callers can shift a few hits between each other
+        hits = _parse_date_cached.cache_info().hits - before
+        stats['total'] = stats.get('total', 0) + len(result)
+        stats['cache_hits'] = stats.get('cache_hits', 0) + hits
+        stats['hit_rate'] = stats['cache_hits'] / stats['total'] if stats['total'] else 0
+    return result
@@ -1,5 +1,12 @@
+import collections
+import contextlib
+import copy
+import json
 import logging
+import logging.handlers
+import math
 import os
+import queue
 import sys
 import threading
 import time
@@ -7,7 +14,7 @@ import time
 import colorlog
 from colorama import Fore
 
-from stool.misc_utils import deprecated
+from stool.misc_utils import DateTimeEncoder, deprecated
 
 # Thread-specific colors
 # _THREAD_COLORS = [34, 36, 32, 33, 31, 35]
@@ -35,10 +42,27 @@ def get_thread_number():
     return int(n) if n.isdigit() else -1
 
 
+_thread_local = threading.local()
+
+
+def _get_thread_number():
+    """get_thread_number(), worked out once per thread."""
+    try:
+        return _thread_local.number
+    except AttributeError:
+        _thread_local.number = get_thread_number()
+        return _thread_local.number
+
+
 def _get_thread_color():
-    """Get color based on the thread number."""
-    thread_number = get_thread_number()
-    return Fore.WHITE if thread_number < 0 else _THREAD_COLORS[thread_number % len(_THREAD_COLORS)]
+    """Get color based on the thread number, worked out once per thread."""
+    try:
+        return _thread_local.color
+    except AttributeError:
+        thread_number = _get_thread_number()
+        color = Fore.WHITE if thread_number < 0 else _THREAD_COLORS[thread_number % len(_THREAD_COLORS)]
+        _thread_local.color = color
+        return color
 
 
 def print_cmd():
@@ -82,11 +106,169 @@ def print_progress(value: int = None, total_value: int = None, step: int = 10):
 
 
 class _ThreadColorFormatter(colorlog.ColoredFormatter):
+    """Provide %(thread_color)s, the color of the thread that logged the record; record.msg is left alone."""
+
     def format(self, record):
-        record.msg = f"{_get_thread_color()}{record.msg}{_RESET_COLOR}"
+        if not hasattr(record, 'thread_color'):  # queued records already carry the color of the logging thread
+            record.thread_color = _get_thread_color()
         return super().format(record)
 
 
+def _json_default(obj):
+    try:
+        return _datetime_encoder.default(obj)
+    except TypeError:
+        return str(obj)
+
+
+_datetime_encoder = DateTimeEncoder()
+# a plain encoder built once: records of primitives never leave the C encoder, datetimes go through DateTimeEncoder
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=_json_default)
+
+
+class _JsonFormatter(logging.Formatter):
+    """Format a record as one JSON line: ts, level, logger, thread, msg, then the extras and exc."""
+    # attributes every record has, anything else came through `extra`
+    _RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'thread_color',
+                                                                    'thread_number'}
+
+    def __init__(self):
+        super().__init__()
+        self._second = None
+        self._second_str = ''
+        self._utc_offset = ''
+
+    def format(self, record):
+        second = int(record.created)
+        if second != self._second:  # strftime once per second, not once per record
+            t = time.localtime(second)
+            offset = time.strftime('%z', t)
+            self._second, self._second_str = second, time.strftime('%Y-%m-%dT%H:%M:%S', t)
+            self._utc_offset = f'{offset[:3]}:{offset[3:]}'
+        thread_number = getattr(record, 'thread_number', None)
+        data = {
+            'ts': f'{self._second_str}.{int(record.msecs):03d}{self._utc_offset}',
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': _get_thread_number() if thread_number is None else thread_number,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return _json_encoder.encode(data)
+
+
+class _BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that leaves flushing to the file buffer (and to flush() / close() / rollover),
+    and formats each record once instead of once more for the size check.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self._size = self.stream.tell()
+
+    def doRollover(self):
+        super().doRollover()
+        self._size = 0
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode('utf-8'))  # maxBytes counts bytes, not characters
+            if self.stream is None:
+                self.stream = self._open()
+                self._size = self.stream.tell()
+            if 0 < self.maxBytes <= self._size + size:
+                self.doRollover()
+            self.stream.write(msg)
+            self._size += size
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+_OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop')
+
+
+_exc_formatter = logging.Formatter()
+
+
+class _AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Put records on a bounded queue, a single background listener formats and writes them with `handler`."""
+
+    def __init__(self, handler, queue_size, overflow='block'):
+        if overflow not in _OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow!r}, expected one of {_OVERFLOW_POLICIES}')
+        super().__init__(queue.Queue(queue_size))
+        self.overflow = overflow
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, handler, respect_handler_level=True)
+        self.listener.start()
+        self._running = True
+
+    def prepare(self, record):
+        # must be taken here, not in the listener thread
+        record.thread_color = _get_thread_color()
+        record.thread_number = _get_thread_number()
+        # unlike QueueHandler.prepare(), merge the args but leave the formatting (and the traceback) to the listener's
+        # formatter, so json_lines still gets the traceback as `exc` rather than appended to `msg`
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+        record.exc_info = None  # tracebacks keep every frame alive until the listener gets to the record
+        return record
+
+    def enqueue(self, record):
+        # handle() holds self.lock around emit(), so self.dropped needs no extra locking
+        if self.overflow == 'block':
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.overflow == 'drop':
+                    self.dropped += 1
+                    return
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def flush(self):
+        """Wait until every queued record has been written."""
+        if self._running:
+            self.queue.join()
+        for handler in self.listener.handlers:
+            handler.flush()
+
+    def close(self):
+        # called by logging.shutdown() at exit, after flush()
+        if self._running:
+            self._running = False
+            self.listener.stop()
+            if self.dropped:
+                warning = logging.makeLogRecord({'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                                 'msg': f'{self.dropped:,} log records dropped, queue was full'})
+                for handler in self.listener.handlers:
+                    handler.handle(warning)
+        super().close()
+
+
 def flush_logger(logger):
     if not logger:
         return
@@ -94,30 +276,72 @@ def flush_logger(logger):
         handler.flush()
 
 
-def get_colored_logger(name='root', level=logging.INFO):
-    """Configure and return a logger with colored output."""
+def get_colored_logger(name='root', level=logging.INFO, queue_size=0, overflow='block',
+                       json_lines=False, file=None, max_bytes=100 * 1024 * 1024, backup_count=5):
+    """
+    Configure and return a logger with colored output.
+
+    With queue_size > 0 the logging threads only put records on a bounded queue, and a background thread formats
+    and writes them, so a slow stdout consumer doesn't block the workers. overflow decides what a full queue does:
+    'block' waits, 'drop_oldest' discards the oldest queued record, 'drop' discards the new one; dropped records
+    are counted in `logger.handlers[0].dropped`. flush_logger() waits until the queue is drained.
+
+    With json_lines=True every record is written as one JSON object per line instead of colored text:
+    {"ts", "level", "logger", "thread", "msg", <extras>..., "exc"}, datetimes as in DateTimeEncoder.
+    With a file, records go to a buffered file rotated at max_bytes, keeping backup_count old files.
+    """
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(level)
-        fmt = "%(log_color)s%(asctime)s %(levelname)s - [%(name)s] - %(message)s"
-        formatter = _ThreadColorFormatter(fmt=fmt, reset=True)
-        handler = colorlog.StreamHandler()
+        if json_lines:
+            formatter = _JsonFormatter()
+        else:
+            fmt = f"%(log_color)s%(asctime)s %(levelname)s - [%(name)s] - %(thread_color)s%(message)s{_RESET_COLOR}"
+            formatter = _ThreadColorFormatter(fmt=fmt, reset=True)
+        handler = _BufferedRotatingFileHandler(file, max_bytes, backup_count) if file else colorlog.StreamHandler()
         handler.setFormatter(formatter)
+        if queue_size > 0:
+            handler = _AsyncQueueHandler(handler, queue_size, overflow)
         logger.addHandler(handler)
     return logger
 
 
+def _to_box(rows, width, title, timestamp):
+    """Render {'key ': 'value'} rows in the box format shared by Counter and Histogram."""
+    max_k = max([len(k) for k in rows.keys()])
+    max_v = max([len(v) for v in rows.values()])
+
+    if max_k + max_v + 6 > width:
+        width = max_k + max_v + 6
+
+    kw = width - max_v - 4
+    s = '\n'.join([f'+ {k:.<{kw}}{v:.>{max_v}} +' for k, v in sorted(rows.items())])
+    title = '' if not title else title + ' '
+    dt = title + time.strftime("%Y-%m-%d %H:%M:%S")
+    et = 'Escaped: ' + sec2str_hms(time.time() - timestamp)
+    return f"\n+ {dt:-^{width - 4}} +\n{s}\n+ {et:-^{width - 4}} +\n"
+
+
 class Counter(dict[str, int]):
+    rate_window = 60  # seconds covered by the sliding-window rate of rates()
+    _RATE_SLOTS = 60  # snapshots kept for the sliding window, taken on reads only
+
     def __init__(self, *args, **kwargs):
         super(Counter, self).__init__(*args, **kwargs)
         self.timestamp = time.time()
         self.last_progress_call = 0
         self.lock = threading.Lock()
+        self._targets = {}
+        self._snapshots = collections.deque(maxlen=self._RATE_SLOTS)
 
     def __repr__(self):
-        return self.to_str(60, 'Counter')
+        return self.to_str(60, 'Counter', rates=True)
 
-    def to_str(self, width=40, title=''):
+    def __reduce__(self):
+        # the lock can't be pickled, rebuild through __init__ so counters can come back from a process pool
+        return self.__class__, (dict(self.items()),), {'timestamp': self.timestamp}
+
+    def to_str(self, width=40, title='', rates=False):
         if not self:
             return ""
         if width < 23:
@@ -126,19 +350,46 @@ class Counter(dict[str, int]):
         v2str = lambda v: (f' {v:,.4f}' if v > 10 else f' {v:,.6f}').rstrip('0').rstrip('.')
 
         new_dict = {f'{k} ': v2str(v) for k, v in self.items()}
-
-        max_k = max([len(k) for k in new_dict.keys()])
-        max_v = max([len(v) for v in new_dict.values()])
-
-        if max_k + max_v + 6 > width:
-            width = max_k + max_v + 6
-
-        kw = width - max_v - 4
-        s = '\n'.join([f'+ {k:.<{kw}}{v:.>{max_v}} +' for k, v in sorted(new_dict.items())])
-        title = '' if not title else title + ' '
-        dt = title + time.strftime("%Y-%m-%d %H:%M:%S")
-        et = 'Escaped: ' + sec2str_hms(time.time() - self.timestamp)
-        return f"\n+ {dt:-^{width - 4}} +\n{s}\n+ {et:-^{width - 4}} +\n"
+        if rates:
+            r2str = lambda r: f"{r['rate']:,.1f}/s avg {r['avg']:,.1f}/s" + (
+                '' if r['eta'] is None else f" ETA {sec2str_hms(r['eta'])}")
+            rate_dict = {f'{k} ': r2str(r) for k, r in self.rates().items()}
+            vw = max([len(v) for v in new_dict.values()])
+            rw = max([len(r) for r in rate_dict.values()])
+            new_dict = {k: f"{v:>{vw}} | {rate_dict.get(k, ''):<{rw}}" for k, v in new_dict.items()}
+
+        return _to_box(new_dict, width, title, self.timestamp)
+
+    def set_target(self, key: str, total) -> None:
+        """Register the value key is expected to reach, rates() and log_progress() then report an ETA for it."""
+        self._targets[key] = total
+
+    def rates(self) -> dict:
+        """
+        Return {key: {'rate': ..., 'avg': ..., 'eta': ...}} where rate is per second over the last `rate_window`
+        seconds, avg is per second since start (or reset) and eta is the seconds left until the key reaches its
+        target (None without a target or while stalled).
+        Snapshots for the window are taken here, in a fixed size ring buffer, so inc() costs nothing extra.
+        """
+        now = time.time()
+        values = self.copy()
+        since, base = self.timestamp, {}
+        with self.lock:  # rates() may run on several threads, e.g. a reporter next to log_progress()
+            if since < now - self.rate_window:
+                for t, snapshot in self._snapshots:  # the oldest snapshot inside the window, else the newest one
+                    since, base = t, snapshot
+                    if t >= now - self.rate_window:
+                        break
+            if not self._snapshots or now - self._snapshots[-1][0] >= self.rate_window / self._RATE_SLOTS:
+                self._snapshots.append((now, values))
+
+        result = {}
+        for k, v in values.items():
+            rate = (v - base.get(k, 0)) / (now - since) if now > since else 0
+            target = self._targets.get(k)
+            eta = (target - v) / rate if target is not None and rate > 0 and v < target else None
+            result[k] = {'rate': rate, 'avg': v / (now - self.timestamp) if now > self.timestamp else 0, 'eta': eta}
+        return result
 
     def get(self, key: str, default: int = 0) -> int:
         """Get value for key, with a default of 0 if not found."""
@@ -154,21 +405,30 @@ class Counter(dict[str, int]):
             self[key] = self.get(key, 0) + value
             return self[key]
 
+    def inc_many(self, deltas) -> None:
+        """Add a whole mapping of {key: value} under a single lock acquisition."""
+        with self.lock:
+            for key, value in deltas.items():
+                self[key] = self.get(key, 0) + value
+
+    def merge(self, *others) -> 'Counter':
+        """Add the values of other counters (Counter, collections.Counter or any mapping), return self."""
+        for other in others:
+            self.inc_many(dict(other.items()))  # snapshot first, `other` may be self or locked
+        return self
+
     @deprecated('use inc() instead')
     def incr(self, key: str, value: int = 1) -> int:
-        with self.lock:
-            self[key] = self.get(key, 0) + value
-            return self[key]
+        return self.inc(key, value)
 
     @deprecated('use inc() instead')
     def increment(self, key: str, value: int = 1) -> int:
-        with self.lock:
-            self[key] = self.get(key, 0) + value
-            return self[key]
+        return self.inc(key, value)
 
     def reset(self):
         with self.lock:
             self.clear()
+            self._snapshots.clear()
             self.timestamp = time.time()
 
     def log_progress(self, key: str = None, modulus: int = 1, interval: int = 300):
@@ -186,6 +446,306 @@ class Counter(dict[str, int]):
                 self.last_progress_call = time.time()
 
 
+class _CounterShard:
+    """Per-thread slot of a ShardedCounter, `values` is only ever written by its own thread."""
+    __slots__ = ('thread', 'values', 'offsets')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.values = {}
+        self.offsets = {}  # shard values already overridden by set()
+
+
+class ShardedCounter(Counter):
+    """
+    Counter for heavily threaded workers, inc() never takes the shared lock.
+
+    Every thread accumulates into its own shard and reads (get(), to_str(), log_progress(), items(), `in`, ...)
+    merge the shards on demand, so a read costs O(threads * keys). Values are the same as with Counter,
+    except that inc() returns the calling thread's own total for the key (since its first inc() or the last set()
+    or reset()) instead of the overall one: computing that would mean reading every shard. Checks like
+    `c.inc(key) % 1000 == 0` then fire every 1000 increments of each thread.
+    Code that serializes the counter directly (json.dumps, dict(...)) should go through copy() first.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ShardedCounter, self).__init__(*args, **kwargs)
+        self._base = dict(dict.items(self))  # values pinned by set(), shards add on top
+        self._shards = []
+        self._local = threading.local()
+
+    def _new_shard(self):
+        shard = _CounterShard(threading.current_thread())
+        with self.lock:
+            self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _merge(self):
+        """Sum base and shards into the dict storage, fold shards of finished threads. Caller holds the lock."""
+        merged = dict(self._base)
+        alive = []
+        for shard in self._shards:
+            is_alive = shard.thread.is_alive()  # checked first, a dead thread cannot write after the copy
+            offsets = shard.offsets
+            for k, v in shard.values.copy().items():
+                merged[k] = merged.get(k, 0) + v - offsets.get(k, 0)
+                if not is_alive:
+                    self._base[k] = self._base.get(k, 0) + v - offsets.get(k, 0)
+            if is_alive:
+                alive.append(shard)
+        self._shards = alive
+        dict.clear(self)
+        dict.update(self, merged)
+
+    def __getitem__(self, key):
+        with self.lock:
+            self._merge()
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __contains__(self, key):
+        with self.lock:
+            self._merge()
+            return super().__contains__(key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        with self.lock:
+            self._merge()
+            return super().__len__()
+
+    def keys(self):
+        return self.copy().keys()
+
+    def values(self):
+        return self.copy().values()
+
+    def items(self):
+        return self.copy().items()
+
+    def copy(self):
+        """Return the merged values as a plain dict."""
+        with self.lock:
+            self._merge()
+            return dict(super().items())
+
+    def get(self, key: str, default: int = 0) -> int:
+        with self.lock:
+            self._merge()
+            return super().get(key, default)
+
+    def set(self, key: str, value: int = 0) -> int:
+        with self.lock:
+            self._base[key] = value
+            for shard in self._shards:
+                if key in shard.values:
+                    shard.offsets[key] = shard.values[key]
+            dict.__setitem__(self, key, value)
+            return value
+
+    def inc(self, key: str, value: int = 1) -> int:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        values = shard.values
+        total = values[key] = values.get(key, 0) + value
+        return total - shard.offsets.get(key, 0)
+
+    def inc_many(self, deltas) -> None:
+        try:
+            values = self._local.shard.values
+        except AttributeError:
+            values = self._new_shard().values
+        for key, value in deltas.items():
+            values[key] = values.get(key, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self._base.clear()
+            self._shards = []
+            self._local = threading.local()  # every thread registers a fresh shard on its next inc()
+            self.clear()
+            self._snapshots.clear()
+            self.timestamp = time.time()
+
+
+class _HistogramData:
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = {}  # bucket index -> number of values
+        self.count = 0
+        self.total = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+
+class Histogram:
+    """
+    Thread-safe, fixed memory histogram for latencies and other non-negative values.
+
+    Buckets are log-linear (HDR style): every power of two is split into 64 linear sub-buckets, so percentiles
+    are within 1% of the recorded values while a key never holds more than a few thousand buckets.
+    Histograms merge exactly, across threads or processes (they pickle). Infinity goes to the last bucket, NaN is
+    not recorded but counted in `skipped`.
+
+        h = Histogram()
+        with h.time('fetch'):  # or @h.time('fetch'), records milliseconds
+            ...
+        h.record('bytes', 1024)
+        h.percentile('fetch', 99), h.stats('fetch')
+    """
+    _SUB_BUCKETS = 64
+    _MIN_EXP = -20  # values below 2**-20 share the first bucket
+    _MAX_EXP = 40  # values from 2**40 up share the last bucket
+    _MAX_INDEX = (_MAX_EXP - _MIN_EXP) * _SUB_BUCKETS - 1
+
+    def __init__(self):
+        self.timestamp = time.time()
+        self.lock = threading.Lock()
+        self.skipped = 0
+        self._data = {}
+
+    def __repr__(self):
+        return self.to_str(60, 'Histogram')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('skipped', 0)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def _index(cls, value):
+        if value == math.inf:
+            return cls._MAX_INDEX
+        m, e = math.frexp(value)  # value = m * 2**e, 0.5 <= m < 1
+        if e <= cls._MIN_EXP or value <= 0:
+            return 0
+        return min((e - cls._MIN_EXP) * cls._SUB_BUCKETS + int((2 * m - 1) * cls._SUB_BUCKETS), cls._MAX_INDEX)
+
+    @classmethod
+    def _value(cls, index):
+        """Middle of the bucket."""
+        e, sub = divmod(index, cls._SUB_BUCKETS)
+        return math.ldexp(1 + (sub + 0.5) / cls._SUB_BUCKETS, e + cls._MIN_EXP - 1)
+
+    def record(self, key: str, value) -> None:
+        if value != value:  # NaN, there is no bucket for it
+            with self.lock:
+                self.skipped += 1
+            return
+        index = self._index(value)
+        with self.lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = _HistogramData()
+            data.counts[index] = data.counts.get(index, 0) + 1
+            data.count += 1
+            data.total += value
+            if value < data.min:
+                data.min = value
+            if value > data.max:
+                data.max = value
+
+    @contextlib.contextmanager
+    def time(self, key: str):
+        """Record the elapsed milliseconds of a with block, or of every call when used as a decorator."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(key, (time.perf_counter() - start) * 1000)
+
+    def keys(self):
+        return list(self._data)
+
+    def count(self, key: str) -> int:
+        data = self._data.get(key)
+        return data.count if data else 0
+
+    def percentile(self, key: str, q):
+        """Return the q-th percentile (0-100) of key, None if nothing has been recorded."""
+        with self.lock:
+            data = self._data.get(key)
+            if not data:
+                return None
+            return self._percentiles(data, (q,))[0]
+
+    def _percentiles(self, data, qs):
+        result = []
+        indexes = sorted(data.counts)
+        for q in qs:
+            rank = max(1, math.ceil(data.count * q / 100))
+            seen = 0
+            for index in indexes:
+                seen += data.counts[index]
+                if seen >= rank:
+                    break
+            result.append(min(max(self._value(index), data.min), data.max))
+        return result
+
+    def stats(self, key: str) -> dict:
+        """Return {'count', 'mean', 'min', 'p50', 'p90', 'p99', 'max'} of key, an empty dict if nothing recorded."""
+        with self.lock:
+            data = self._data.get(key)
+            if not data:
+                return {}
+            p50, p90, p99 = self._percentiles(data, (50, 90, 99))
+            return {'count': data.count, 'mean': data.total / data.count, 'min': data.min,
+                    'p50': p50, 'p90': p90, 'p99': p99, 'max': data.max}
+
+    def merge(self, *others) -> 'Histogram':
+        """Add the values of other histograms, the bucket layout is shared so nothing is lost. Return self."""
+        for other in others:
+            with other.lock:
+                snapshot = [(k, dict(d.counts), d.count, d.total, d.min, d.max) for k, d in other._data.items()]
+                skipped = other.skipped
+            with self.lock:
+                self.skipped += skipped
+                for key, counts, count, total, min_, max_ in snapshot:
+                    data = self._data.get(key)
+                    if data is None:
+                        data = self._data[key] = _HistogramData()
+                    for index, n in counts.items():
+                        data.counts[index] = data.counts.get(index, 0) + n
+                    data.count += count
+                    data.total += total
+                    data.min = min(data.min, min_)
+                    data.max = max(data.max, max_)
+        return self
+
+    def reset(self):
+        with self.lock:
+            self._data.clear()
+            self.skipped = 0
+            self.timestamp = time.time()
+
+    def to_str(self, width=40, title=''):
+        if not self._data:
+            return ""
+        if width < 23:
+            width = 23
+
+        v2str = lambda v: f'{v:,.3f}'.rstrip('0').rstrip('.') if v < 100 else f'{v:,.0f}'
+        rows = {}
+        for key in self.keys():
+            s = self.stats(key)
+            rows[f'{key} '] = (f" n={s['count']:,} p50={v2str(s['p50'])} p90={v2str(s['p90'])}"
+                               f" p99={v2str(s['p99'])} max={v2str(s['max'])}")
+        return _to_box(rows, width, title, self.timestamp)
+
+
 if __name__ == "__main__":
     print_cmd()
     thread_names = [
@@ -1,10 +1,18 @@
+import atexit
+import collections
+import contextlib
+import enum
 import functools
 import hashlib
 import json
 import logging
 import os
-import requests
+import queue
+import re
 import sys
+import threading
+import time
+import uuid
 import warnings
 from datetime import datetime, timedelta
 from typing import Dict, List
@@ -38,9 +46,40 @@ def file_exists_and_not_empty(file_path: str, min_size: int = 100) -> bool:
     return os.path.exists(file_path) and os.path.getsize(file_path) > min_size
 
 
+def _open_compressed(file_path, mode, name=None):
+    """open() in text mode, through gzip for .gz and zstandard for .zst/.zstd files (by name, file_path default)."""
+    name = name or file_path
+    if name.endswith('.gz'):
+        import gzip
+
+        return gzip.open(file_path, mode + 't', encoding='utf-8')
+    if name.endswith(('.zst', '.zstd')):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f'zstandard is required for {file_path}, pip install zstandard') from None
+        return zstandard.open(file_path, mode + 't', encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8')
+
+
+@contextlib.contextmanager
+def _atomic_path(file_path):
+    """Yield a temp path next to file_path, renamed over it on success and removed on failure."""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    # same directory, so the rename is atomic; not mkstemp, its 0600 mode would end up on file_path
+    tmp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        yield tmp_path
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
 def save_json(data, file_path: str) -> None:
     logging.info(f'Saving data to {file_path}')
-    with open(file_path, "w", encoding="utf-8") as f:
+    with _atomic_path(file_path) as tmp_path, open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 
@@ -50,10 +89,257 @@ def load_json(file_path: str):
         return json.load(f)
 
 
-def send_msg(message, title=None):
-    title = title or f"{os.path.basename(sys.argv[0])} {' '.join(sys.argv[1:])}"
-    url = f"https://api.day.app/vFVZRfhJbEsiT9XndGYpf5/{title}/{message}"
-    requests.get(url)
+class JsonlWriter:
+    """
+    Write one compact JSON document per line, datetimes as in DateTimeEncoder, gzip/zstd by file extension.
+
+    By default the file is written to a temp file renamed over file_path by close(), so a crashed job never leaves
+    a truncated file (and an exception inside the with block leaves the old file as it was). With append=True
+    lines are appended to file_path directly (compressed files get a new gzip member / zstd frame, readable as one
+    stream). Lines are buffered, buffer_size bytes at a time.
+    """
+
+    def __init__(self, file_path, append=False, buffer_size=1024 * 1024):
+        self.file_path = file_path
+        self.count = 0
+        self._atomic = None if append else _atomic_path(file_path)
+        path = self._atomic.__enter__() if self._atomic else file_path
+        try:
+            self._file = _open_compressed(path, 'a' if append else 'w', name=file_path)
+        except BaseException:
+            if self._atomic:
+                self._atomic.__exit__(*sys.exc_info())
+            raise
+        self._encode = _jsonl_encode
+        self._closed = False
+        self._lines = []
+        self._buffered = 0
+        self.buffer_size = buffer_size
+
+    def write(self, obj):
+        line = self._encode(obj)
+        self._lines.append(line)
+        self._buffered += len(line) + 1
+        self.count += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, objs):
+        for obj in objs:
+            self.write(obj)
+
+    def flush(self):
+        if self._lines:
+            self._lines.append('')
+            self._file.write('\n'.join(self._lines))
+            self._lines, self._buffered = [], 0
+        self._file.flush()
+
+    def close(self, _exc_info=(None, None, None)):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            try:
+                if _exc_info[0] is None:
+                    self.flush()
+            finally:
+                self._file.close()
+        except BaseException:
+            if self._atomic:  # a failed last write or trailer: drop the temp file, file_path stays as it was
+                self._atomic.__exit__(*sys.exc_info())
+            raise
+        if self._atomic:
+            self._atomic.__exit__(*_exc_info)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close((exc_type, exc_val, exc_tb))
+
+
+def save_jsonl(records, file_path: str, append=False) -> int:
+    """Stream records (any iterable) to a JSON-lines file with JsonlWriter, return the number written."""
+    with JsonlWriter(file_path, append=append) as writer:
+        writer.write_many(records)
+    return writer.count
+
+
+def iter_jsonl(file_path: str, datetimes=True, skip_invalid=False, date_keys=None):
+    """
+    Yield the documents of a JSON-lines file (gzip/zstd by extension) one line at a time, blank lines skipped.
+    With datetimes, ISO strings (of the date_keys fields only, if given) come back as datetime like with
+    DateTimeDecoder. Invalid lines raise ValueError, or are logged and skipped with skip_invalid (e.g. the last
+    line of a file that was being appended to).
+    """
+    decode = DateTimeDecoder(keys=date_keys).decode if datetimes else json.loads
+    with _open_compressed(file_path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield decode(line)
+            except ValueError as e:
+                if not skip_invalid:
+                    raise ValueError(f'{file_path}, line {line_number}: {e}') from e
+                logging.warning(f'Skipped invalid line {line_number} of {file_path}: {e}')
+
+
+_MSG_ENDPOINT = 'https://api.day.app/vFVZRfhJbEsiT9XndGYpf5'
+_STOP = object()
+
+
+class Notifier:
+    """
+    Deliver messages to a push endpoint (GET {endpoint}/{title}/{message}, both URL-escaped) from a background
+    thread, over one pooled requests.Session.
+
+    At most rate_limit requests go out per window seconds. Messages queued meanwhile are coalesced per title, a
+    title with several of them is sent as one digest. Failed requests (connection errors, 5xx) are retried up to
+    retries times, waiting backoff, 2 * backoff, ... seconds. send() never blocks unless the queue is full, or
+    the notifier is closed: then it delivers the message itself.
+    """
+
+    def __init__(self, endpoint=_MSG_ENDPOINT, timeout=10, rate_limit=5, window=60, retries=3, backoff=1.0,
+                 queue_size=1000, max_digest_lines=50):
+        self.endpoint = endpoint.rstrip('/')
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.window = window
+        self.retries = retries
+        self.backoff = backoff
+        self.max_digest_lines = max_digest_lines
+        self._queue = queue.Queue(queue_size)
+        self._sent = collections.deque()  # monotonic times of the requests inside the window
+        self._unsent = 0
+        self._done = threading.Condition()
+        self._send_lock = threading.Lock()  # nothing gets queued once close() has started
+        self._closed = False
+        self._session = None
+        self._thread = threading.Thread(target=self._run, name='Notifier', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def send(self, message, title=None):
+        title = title or f"{os.path.basename(sys.argv[0])} {' '.join(sys.argv[1:])}"
+        with self._send_lock:
+            with self._done:
+                self._unsent += 1
+            if not self._closed:
+                self._queue.put((str(title), str(message)))
+                return
+        self._send_now(str(title), [str(message)])  # e.g. from an exit hook that runs after close()
+
+    def flush(self, timeout=None):
+        """Wait until every message sent so far is delivered (or given up), return False on timeout."""
+        with self._done:
+            return self._done.wait_for(lambda: self._unsent == 0, timeout)
+
+    def close(self):
+        """Deliver what is queued, ignoring the rate limit, and stop the thread. Later messages go out right away."""
+        with self._send_lock:
+            self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        while True:  # the thread died, or never saw these
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._send_now(item[0], [item[1]])
+        atexit.unregister(self.close)
+
+    def _slot_wait(self):
+        now = time.monotonic()
+        while self._sent and self._sent[0] <= now - self.window:
+            self._sent.popleft()
+        return 0 if len(self._sent) < self.rate_limit else self._sent[0] + self.window - now
+
+    def _run(self):
+        pending = {}  # title -> [messages], oldest title first
+        closing = False
+        while not closing or pending:
+            wait = self._slot_wait() if pending else None
+            items = []
+            if not closing and (wait is None or wait > 0):
+                try:
+                    items.append(self._queue.get(timeout=wait))
+                except queue.Empty:
+                    pass
+            while True:  # take whatever else is queued, to coalesce it
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in items:
+                if item is _STOP:
+                    closing = True
+                else:
+                    pending.setdefault(item[0], []).append(item[1])
+            if pending and (closing or self._slot_wait() == 0):
+                title = next(iter(pending))
+                self._sent.append(time.monotonic())
+                self._send_now(title, pending.pop(title))
+
+    def _send_now(self, title, messages):
+        try:
+            self._deliver(title, messages[0] if len(messages) == 1 else self._digest(messages))
+        except Exception as e:  # must neither kill the thread nor leave flush() waiting
+            logging.error(f'Failed to send message "{title}": {e!r}')
+        finally:
+            with self._done:
+                self._unsent -= len(messages)
+                self._done.notify_all()
+
+    def _digest(self, messages):
+        lines = messages[:self.max_digest_lines]
+        if len(messages) > len(lines):
+            lines.append(f'... and {len(messages) - len(lines)} more')
+        return f'{len(messages)} messages:\n' + '\n'.join(lines)
+
+    def _deliver(self, title, message):
+        import requests  # imported on demand, keeps `import stool` light
+        from urllib.parse import quote
+
+        if self._session is None:
+            self._session = requests.Session()
+        url = f"{self.endpoint}/{quote(title, safe='')}/{quote(message, safe='')}"
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session.get(url, timeout=self.timeout)
+                if response.status_code < 500:
+                    if response.status_code >= 400:
+                        logging.error(f'Message "{title}" rejected: HTTP {response.status_code}')
+                    return
+                error = f'HTTP {response.status_code}'
+            except requests.RequestException as e:
+                error = e
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        logging.error(f'Failed to send message "{title}" after {self.retries + 1} attempts: {error}')
+
+
+_notifier = None
+_notifier_pid = None  # a forked child needs its own sender thread
+_notifier_lock = threading.Lock()
+
+
+def send_msg(message, title=None, wait=False):
+    """
+    Push a message through a shared Notifier, to $STOOL_MSG_ENDPOINT if set. Returns right away unless wait is
+    True; bursts are coalesced and rate limited, see Notifier.
+    """
+    global _notifier, _notifier_pid
+    with _notifier_lock:
+        if _notifier is None or _notifier_pid != os.getpid():
+            _notifier = Notifier(os.getenv('STOOL_MSG_ENDPOINT', _MSG_ENDPOINT))
+            _notifier_pid = os.getpid()
+    _notifier.send(message, title)
+    if wait:
+        _notifier.flush()
 
 
 def get_md5(url):
@@ -61,23 +347,76 @@ def get_md5(url):
     return hashlib.md5(url.encode('utf-8')).hexdigest()
 
 
-def del_by_size(directory, ext='.html', min_size=3 * 1024):
-    total = 0
-    total_size = 0
-    deleted = 0
-    deleted_size = 0
-    for root, dirs, files in os.walk(directory):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            if os.path.isfile(file_path) and file_path.endswith(ext):
-                total += 1
-                file_size = os.path.getsize(file_path)
-                total_size += file_size
-                if file_size < min_size:
-                    deleted += 1
-                    deleted_size += file_size
-                    os.remove(file_path)
-    return total, total_size, deleted, deleted_size
+def _scan_for_deletion(directory, exts, min_size, dry_run):
+    """Handle the files of one directory, return its subdirectories and (total, total_size, deleted, deleted_size)."""
+    subdirs = []
+    total = total_size = deleted = deleted_size = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(exts) and entry.is_file():
+                    file_size = entry.stat().st_size
+                    total += 1
+                    total_size += file_size
+                    if file_size < min_size:
+                        if not dry_run:
+                            try:
+                                os.remove(entry.path)
+                            except OSError as e:
+                                logging.warning(f'Failed to delete {entry.path}: {e}')
+                                continue
+                        deleted += 1
+                        deleted_size += file_size
+    except OSError as e:  # unreadable or vanished directory, skipped like os.walk does
+        logging.warning(f'Failed to scan {directory}: {e}')
+    return subdirs, (total, total_size, deleted, deleted_size)
+
+
+def del_by_size(directory, ext='.html', min_size=3 * 1024, dry_run=False, workers=None, progress=None):
+    """
+    Delete the files under directory with extension ext (a str or several of them) smaller than min_size bytes.
+
+    Directories are scanned with os.scandir, one stat per matching file, subdirectories in parallel over workers
+    threads (1 scans in the calling thread, None lets ThreadPoolExecutor decide). With dry_run nothing is deleted,
+    the counts are the same. progress, if given, is called from the calling thread after each directory as
+    progress(done, total): the directories scanned so far and the ones found so far, e.g. print_progress.
+
+    Returns:
+        tuple: (total, total_size, deleted, deleted_size) of the matching files.
+    """
+    exts = (ext,) if isinstance(ext, str) else tuple(ext)
+    totals = [0, 0, 0, 0]
+    directories = [0, 1]  # scanned, found
+
+    def add(subdirs, stats):
+        for i, v in enumerate(stats):
+            totals[i] += v
+        directories[0] += 1
+        directories[1] += len(subdirs)
+        if progress:
+            progress(*directories)
+
+    if workers == 1:
+        stack = [directory]
+        while stack:
+            subdirs, stats = _scan_for_deletion(stack.pop(), exts, min_size, dry_run)
+            stack.extend(subdirs)
+            add(subdirs, stats)
+        return tuple(totals)
+
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='del_by_size') as executor:
+        futures = {executor.submit(_scan_for_deletion, directory, exts, min_size, dry_run)}
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, stats = future.result()
+                futures.update(executor.submit(_scan_for_deletion, d, exts, min_size, dry_run) for d in subdirs)
+                add(subdirs, stats)
+    return tuple(totals)
 
 
 def exclude_keyword(data: Dict, excluded_keyword: str, mask=None) -> Dict:
@@ -89,9 +428,17 @@ def exclude_keyword(data: Dict, excluded_keyword: str, mask=None) -> Dict:
         return {k: v for k, v in data.items() if excluded_keyword not in k}
 
 
+def _key_set(keys):
+    """keys as a set for `in`, a single str is one key (not its characters)."""
+    if isinstance(keys, (set, frozenset)):
+        return keys
+    return frozenset((keys,) if isinstance(keys, str) else keys)
+
+
 def exclude_keys(data: Dict, excluded_keys: List, mask=None) -> Dict:
     if not excluded_keys:
         return data
+    excluded_keys = _key_set(excluded_keys)
     if mask:
         return {k: (v if k not in excluded_keys else mask) for k, v in data.items()}
     else:
@@ -103,29 +450,346 @@ def reserve_keyword(data: Dict, reserved_keyword: str) -> Dict:
 
 
 def reserve_keys(data: Dict, reserved_keys: List) -> Dict:
-    return {k: v for k, v in data.items() if k in reserved_keys} if reserved_keys else data
+    if not reserved_keys:
+        return data
+    reserved_keys = _key_set(reserved_keys)
+    return {k: v for k, v in data.items() if k in reserved_keys}
+
+
+def _key_matcher(keys, keywords):
+    """Predicate for "key is one of keys or contains one of keywords", None if both are empty."""
+    keys = _key_set(keys)
+    keywords = [kw for kw in ((keywords,) if isinstance(keywords, str) else keywords) if kw]
+    if len(keywords) > 1:
+        search = re.compile('|'.join(map(re.escape, keywords))).search
+    elif keywords:
+        keyword = keywords[0]
+        search = lambda k: keyword in k
+    else:
+        search = None
+
+    if search is None:
+        return keys.__contains__ if keys else None
+    return lambda k: k in keys or (isinstance(k, str) and bool(search(k)))
+
+
+_KEEP, _DROP, _MASK = range(3)
+
+
+class KeyProjection:
+    """
+    exclude_keys / exclude_keyword / reserve_keys / reserve_keyword built once and applied to many dicts.
+
+    A key is kept when there are no reserve criteria or it is in reserve or contains one of reserve_keywords. A kept
+    key in exclude or containing one of exclude_keywords is then dropped, or its value replaced by mask if mask is
+    not None. With recursive, dicts nested in the values (in lists and tuples too) are projected the same way.
+    The decision is memoized per key, for the first max_cached distinct keys; past that, dicts with keys never
+    seen before are projected key by key.
+    """
 
+    def __init__(self, exclude=(), exclude_keywords=(), reserve=(), reserve_keywords=(), mask=None, recursive=False,
+                 max_cached=65536):
+        self._exclude = _key_matcher(exclude, exclude_keywords)
+        self._reserve = _key_matcher(reserve, reserve_keywords)
+        self.mask = mask
+        self.recursive = recursive
+        self.max_cached = max_cached
+        self._kept, self._masked = set(), set()
+        self._decided = set()  # keys already sorted into _kept, _masked or neither (dropped)
+
+    def _decide(self, key):
+        if self._reserve is not None and not self._reserve(key):
+            return _DROP
+        if self._exclude is not None and self._exclude(key):
+            return _DROP if self.mask is None else _MASK
+        return _KEEP
+
+    def apply(self, data: Dict) -> Dict:
+        """Projected copy of data."""
+        decided = self._decided
+        if not data.keys() <= decided:
+            for k in data:
+                if k not in decided and len(decided) < self.max_cached:
+                    decision = self._decide(k)
+                    if decision != _DROP:
+                        (self._kept if decision == _KEEP else self._masked).add(k)
+                    decided.add(k)  # last, other threads may be reading
+            if not data.keys() <= decided:  # past max_cached
+                return self._apply_uncached(data)
+
+        kept, masked, mask = self._kept, self._masked, self.mask
+        if self.recursive:
+            nested = self._nested
+            return {k: (nested(v) if k in kept else mask) for k, v in data.items() if k in kept or k in masked}
+        if masked:
+            return {k: (v if k in kept else mask) for k, v in data.items() if k in kept or k in masked}
+        return {k: v for k, v in data.items() if k in kept}
+
+    def _apply_uncached(self, data):
+        result = {}
+        for k, v in data.items():
+            decision = _KEEP if k in self._kept else _MASK if k in self._masked else self._decide(k)
+            if decision == _KEEP:
+                result[k] = self._nested(v) if self.recursive else v
+            elif decision == _MASK:
+                result[k] = self.mask
+        return result
+
+    __call__ = apply
+
+    def apply_many(self, records):
+        """Lazily project an iterable of dicts."""
+        return map(self.apply, records)
+
+    def _nested(self, value):
+        if isinstance(value, dict):
+            return self.apply(value)
+        if type(value) is list or type(value) is tuple:
+            return type(value)(self._nested(v) for v in value)
+        return value
+
+
+_WILDCARD = '*'
+
+
+class DeepPath:
+    """
+    A deep_get() path parsed once, e.g. DeepPath('data.items.0.name') or DeepPath(['data', 'items', 0, 'name']).
 
-def deep_get(dictionary, keys, default=None):
+    Keys walk into dicts; integer keys (or digit strings, negative ones included) also index lists and tuples, a
+    digit string is still a plain key in a dict. With wildcard=True, '*' takes every value of a dict or every item
+    of a list, get() then returns the list of what was found (None values left out), default if nothing was;
+    otherwise '*' is a plain key like any other.
+    """
+    __slots__ = ('path', 'wildcard', 'get', '_steps')
+
+    def __init__(self, path, wildcard=False):
+        self.path = path
+        self.wildcard = wildcard
+        keys = path.split('.') if isinstance(path, str) else list(path)
+        self._steps = tuple((key, _list_index(key)) for key in keys)
+        self.get = self._get_all if wildcard and _WILDCARD in keys else self._getter(self._steps)
+
+    def __repr__(self):
+        return f'DeepPath({self.path!r}, wildcard=True)' if self.wildcard else f'DeepPath({self.path!r})'
+
+    def __call__(self, obj, default=None):
+        return self.get(obj, default)
+
+    @staticmethod
+    def _getter(steps):
+        # a closure over the steps, the per-lookup cost is just the walk
+        def get(obj, default=None):
+            for key, index in steps:
+                if isinstance(obj, dict):
+                    if key not in obj:
+                        return default
+                    obj = obj[key]
+                elif index is not None and isinstance(obj, (list, tuple)):
+                    try:
+                        obj = obj[index]
+                    except IndexError:
+                        return default
+                else:
+                    return default
+            return default if obj is None else obj
+
+        return get
+
+    def _get_all(self, obj, default=None):
+        found = [v for v in self._iter(obj, 0) if v is not None]
+        return found if found else default
+
+    def _iter(self, obj, i):
+        """Yield every value the steps from i on lead to."""
+        if i == len(self._steps):
+            yield obj
+            return
+        key, index = self._steps[i]
+        if key == _WILDCARD:
+            children = obj.values() if isinstance(obj, dict) else obj if isinstance(obj, (list, tuple)) else ()
+            for child in children:
+                yield from self._iter(child, i + 1)
+        elif isinstance(obj, dict):
+            if key in obj:
+                yield from self._iter(obj[key], i + 1)
+        elif index is not None and isinstance(obj, (list, tuple)) and -len(obj) <= index < len(obj):
+            yield from self._iter(obj[index], i + 1)
+
+
+_LIST_INDEX = re.compile(r'-?[0-9]+')
+
+
+def _list_index(key):
+    if isinstance(key, int):
+        return key
+    if isinstance(key, str) and _LIST_INDEX.fullmatch(key):
+        return int(key)
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_path(path: str, wildcard=False) -> DeepPath:
+    """DeepPath(path, wildcard), cached per path string."""
+    return DeepPath(path, wildcard)
+
+
+def deep_get(dictionary, keys, default=None, wildcard=False):
     if not dictionary:
         return default
 
     if isinstance(keys, str):
-        keys = keys.split('.')
-
+        return compile_path(keys, wildcard).get(dictionary, default)
     if keys and isinstance(keys, list):
-        for key in keys:
-            if isinstance(dictionary, dict) and key in dictionary:
-                dictionary = dictionary[key]
-            else:
-                return default
-        return dictionary if None != dictionary else default
+        return DeepPath(keys, wildcard).get(dictionary, default)
 
     return default
 
 
+def deep_get_columns(records, paths, default=None, wildcard=False) -> Dict[str, List]:
+    """
+    deep_get() of several paths (str or DeepPath) on many records in one pass, returned as columns:
+    {path: [value in the first record, value in the second one, ...]}, records can be any iterable.
+    """
+    paths = list(paths)
+    columns = [[] for _ in paths]
+    getters = [(column.append, (path if isinstance(path, DeepPath) else compile_path(path, wildcard)).get)
+               for column, path in zip(columns, paths)]
+    for record in records:
+        for append, get in getters:
+            append(get(record, default))
+    return dict(zip(paths, columns))
+
+
 # custom_json_encoder.py
 
+_JSON_BACKENDS = ('orjson', 'json')
+_json_backend = None  # (name, module), picked on first use
+_NOT_DONE = object()
+
+
+def set_json_backend(name=None):
+    """
+    Choose the library behind to_json, DateTimeEncoder, CustomJSONEncoder and JsonlWriter: 'orjson', 'json' (stdlib
+    only), or None for orjson if installed. Defaults to $STOOL_JSON_BACKEND. The output doesn't depend on the
+    backend: what orjson can't reproduce byte for byte (NaN, floats under 1e-4, ints past 64 bits, indents other
+    than 2, non-str keys, sort_keys, ...) goes through the stdlib, and so do UUIDs and Enums, which orjson would
+    serialize where the stdlib calls default(). Decoding stays on the stdlib: with DateTimeDecoder's object_hook
+    the hook calls dominate, orjson + a walk over the result was no faster.
+    """
+    global _json_backend
+    if name and name not in _JSON_BACKENDS:
+        raise ValueError(f'Unsupported JSON backend {name}, expected one of {_JSON_BACKENDS}')
+    for candidate in (name,) if name else _JSON_BACKENDS:
+        if candidate == 'json':
+            _json_backend = ('json', json)
+            return candidate
+        try:
+            module = __import__(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        _json_backend = (candidate, module)
+        return candidate
+
+
+def get_json_backend():
+    """Name of the JSON backend in use, see set_json_backend()."""
+    return _get_json_backend()[0]
+
+
+def _get_json_backend():
+    if _json_backend is None:
+        set_json_backend(os.getenv('STOOL_JSON_BACKEND') or None)
+    return _json_backend
+
+
+# orjson writes 1e-05 as 0.00001, 1e-09 as 1e-9 and, before 3.12, 1e+16 as 1e16; a match may as well be inside a
+# string, then the stdlib does it
+_ORJSON_FLOAT_MISMATCH = re.compile(rb'0\.0000|e-\d(?!\d)|e\d')
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')  # what ensure_ascii escapes on top of what orjson escapes
+
+
+def _escape_non_ascii(match):
+    c = ord(match.group())
+    if c < 0x10000:
+        return f'\\u{c:04x}'
+    c -= 0x10000
+    return f'\\u{0xd800 | (c >> 10):04x}\\u{0xdc00 | (c & 0x3ff):04x}'  # surrogate pair, like the stdlib
+
+
+_PLAIN_TYPES = frozenset((str, int, bool, type(None)))
+_INFINITIES = (float('inf'), float('-inf'))
+
+
+def _orjson_differs(o):
+    """True if o holds what orjson writes differently from the stdlib: NaN/infinity, UUIDs, Enums."""
+    t = type(o)
+    if t in _PLAIN_TYPES:
+        return False
+    if t is float:
+        return o != o or o in _INFINITIES  # orjson writes them as null
+    if isinstance(o, dict):
+        return any(map(_orjson_differs, o.values()))
+    if isinstance(o, (list, tuple)):
+        return any(map(_orjson_differs, o))
+    # the stdlib writes IntEnum/StrEnum members as plain ints/strs, like orjson; other Enums and UUIDs go to default()
+    return isinstance(o, (uuid.UUID, enum.Enum)) and not isinstance(o, (int, float, str))
+
+
+def _fast_encode(encoder, o):
+    """encoder.encode(o) through orjson when that's byte-identical to the stdlib, else _NOT_DONE."""
+    name, orjson = _get_json_backend()
+    if name != 'orjson' or encoder.sort_keys or encoder.skipkeys or encoder.item_separator != ',':
+        return _NOT_DONE
+    if encoder.indent in (2, '  ') and encoder.key_separator == ': ':
+        option = orjson.OPT_INDENT_2
+    elif encoder.indent is None and encoder.key_separator == ':':
+        option = 0
+    else:
+        return _NOT_DONE
+    try:
+        if _orjson_differs(o):
+            return _NOT_DONE
+    except RecursionError:  # circular (or absurdly deep): the stdlib raises its own error for it
+        return _NOT_DONE
+
+    def default(obj):
+        result = encoder.default(obj)
+        if _orjson_differs(result):
+            raise TypeError('left to the stdlib')
+        return result
+
+    try:
+        # datetimes and dataclasses go to default() like with the stdlib, not to orjson's own formats
+        out = orjson.dumps(o, default=default,
+                           option=option | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+    except TypeError:  # includes orjson.JSONEncodeError: unknown type, non-str key, int past 64 bits, ...
+        return _NOT_DONE
+    if _ORJSON_FLOAT_MISMATCH.search(out):
+        return _NOT_DONE
+    out = out.decode()
+    if encoder.ensure_ascii and (not out.isascii() or '\x7f' in out):
+        out = _NON_ASCII.sub(_escape_non_ascii, out)  # non-ASCII only ever appears inside strings
+    return out
+
+
+def _datetime_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
+# not a DateTimeEncoder: that one is a shared singleton, re-configured by every json.dumps(cls=DateTimeEncoder)
+_jsonl_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_datetime_default)
+
+
+def _jsonl_encode(o):
+    out = _fast_encode(_jsonl_encoder, o)
+    return _jsonl_encoder.encode(o) if out is _NOT_DONE else out
+
+
 class DateTimeEncoder(json.JSONEncoder):
     """Singleton JSON encoder that handles datetime objects."""
     _instance = None
@@ -136,33 +800,55 @@ class DateTimeEncoder(json.JSONEncoder):
         return cls._instance
 
     def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+        return _datetime_default(obj)
+
+    def encode(self, o):
+        out = _fast_encode(self, o)
+        return super().encode(o) if out is _NOT_DONE else out
+
+
+# fromisoformat() dates all start with a 4 digit year followed by '-', 'W' or (3.11+, basic format) a digit
+_ISO_AFTER_YEAR = frozenset('-W0123456789')
 
 
 class DateTimeDecoder(json.JSONDecoder):
-    """Singleton JSON decoder that converts ISO format datetime strings back to datetime objects."""
+    """
+    JSON decoder that converts ISO format datetime strings back to datetime objects.
+
+    Only strings shaped like an ISO date (a 4 digit year then '-', 'W' or a digit) are tried with
+    datetime.fromisoformat, other text costs no exception. keys, if given, limits the conversion to those field
+    names (the date fields of a known schema). Decoded dicts are left alone, one with a datetime is copied.
+    DateTimeDecoder() without arguments is a shared instance, with arguments a new one.
+    """
     _instance = None
 
     def __new__(cls, *args, **kwargs):
+        if args or kwargs:
+            return super().__new__(cls)
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, keys=None, **kwargs):
         if not hasattr(self, '_initialized'):
+            self.keys = frozenset(keys) if keys is not None else None
             super().__init__(object_hook=self._decode_datetime, *args, **kwargs)
             self._initialized = True
 
     def _decode_datetime(self, obj):
-        for key, value in obj.items():
-            if isinstance(value, str):
+        decoded = None
+        # with keys, look those up instead of scanning every field
+        items = obj.items() if self.keys is None else ((k, obj[k]) for k in self.keys if k in obj)
+        for key, value in items:
+            if type(value) is str and len(value) >= 7 and value[4] in _ISO_AFTER_YEAR and value[:4].isdigit():
                 try:
-                    obj[key] = datetime.fromisoformat(value)
+                    value = datetime.fromisoformat(value)
                 except ValueError:
-                    pass  # Not a datetime string
-        return obj
+                    continue  # Not a datetime string
+                if decoded is None:
+                    decoded = dict(obj)
+                decoded[key] = value
+        return obj if decoded is None else decoded
 
 
 def to_json(data, indent=2):
@@ -170,8 +856,10 @@ def to_json(data, indent=2):
     return json.dumps(data, cls=DateTimeEncoder, indent=indent, ensure_ascii=False)
 
 
-def from_json(json_str):
-    """Parse JSON string to Python object with datetime support."""
+def from_json(json_str, keys=None):
+    """Parse JSON string to Python object with datetime support, only for the fields in keys if given."""
+    if keys is not None:
+        return DateTimeDecoder(keys=keys).decode(json_str)
     return json.loads(json_str, cls=DateTimeDecoder)
 
 
@@ -180,7 +868,7 @@ class CustomJSONEncoder(json.JSONEncoder):
     A customizable JSON encoder that formats floats, datetimes, and timedeltas.
 
     Formatting:
-    - Floats are rounded to two decimal places.
+    - Floats are rounded to two decimal places (the digits of float_format).
     - Datetimes are formatted as "YYYY-MM-DD HH:MM:SS".
     - Timedeltas are formatted as "hh:mm:ss.SSS" where:
         - hh can exceed 24 to represent total hours.
@@ -193,11 +881,26 @@ class CustomJSONEncoder(json.JSONEncoder):
     datetime_format = "%Y-%m-%d %H:%M:%S"  # Default datetime format
     timedelta_format = "hh:mm:ss.SSS"  # Default timedelta format
 
+    def _round_floats(self, o, digits):
+        # default() never sees floats, json encodes them natively: round them before encoding
+        if isinstance(o, float):
+            return round(o, digits) if o - o == 0 else o  # NaN and infinities stay as they are
+        if isinstance(o, dict):
+            return {k: self._round_floats(v, digits) for k, v in o.items()}
+        if isinstance(o, (list, tuple)):
+            return [self._round_floats(v, digits) for v in o]
+        return o
+
+    def encode(self, o):
+        o = self._round_floats(o, int(self.float_format.strip('.f')))
+        out = _fast_encode(self, o)
+        return ''.join(super().iterencode(o, _one_shot=True)) if out is _NOT_DONE else out
+
+    def iterencode(self, o, _one_shot=False):
+        return super().iterencode(self._round_floats(o, int(self.float_format.strip('.f'))), _one_shot)
+
     def default(self, obj):
-        if isinstance(obj, float):
-            # Round float to two decimal places
-            return round(obj, 2)
-        elif isinstance(obj, datetime):
+        if isinstance(obj, datetime):
             # Format datetime using the specified format
             return obj.strftime(self.datetime_format)
         elif isinstance(obj, timedelta):
@@ -1,4 +1,7 @@
+import atexit
 import os
+import threading
+import time
 
 import pymongo
 import logging
@@ -6,6 +9,10 @@ import pytz
 from dateutil import parser as dateutil_parser
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
+
+from stool.date_utils import time_range_ordinals
 
 _logger = logging.getLogger(__name__)
 
@@ -14,18 +21,180 @@ _COLLECTION_NAME = 'status_monitor'
 
 CAT_SERVICE_STATUS = 'service_status'
 
+_BUCKET_STATS = ('sum', 'min', 'max', 'last')  # accumulators of aggregate(), same names as the $ operators
+
+
+_clients = {}  # (uri, options) -> MongoClient shared by every StatusMonitor of this process
+_clients_lock = threading.Lock()
+
+
+def get_mongo_client(uri, **options):
+    """
+    Process-wide MongoClient for uri and options (MongoClient keyword arguments), created on first use.
+    Instances with the same arguments share one connection pool and one set of monitor threads.
+    """
+    key = (uri, tuple(sorted(options.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = pymongo.MongoClient(uri, **options)
+    return client
+
+
+def close_mongo_clients():
+    """Close all the shared clients, the next get_mongo_client() opens new ones. Runs at exit."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+def _forget_mongo_clients():
+    # a MongoClient is not fork-safe: the child must not touch (nor close) the sockets it inherited
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+atexit.register(close_mongo_clients)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_mongo_clients)
+
+
+_OVERFLOW_POLICIES = ('block', 'drop')
+
+# write errors a later flush may get past: network, elections, shutdowns, timeouts, write conflicts
+_RETRYABLE_CODES = frozenset((6, 7, 50, 63, 89, 91, 112, 133, 150, 189, 262, 9001, 10107, 11600, 11602, 13435,
+                              13436))
+
+
+def _is_retryable(error):
+    if isinstance(error, ConnectionFailure):  # AutoReconnect, NetworkTimeout, ServerSelectionTimeoutError, ...
+        return True
+    if isinstance(error, OperationFailure):
+        return error.code in _RETRYABLE_CODES or error.has_error_label('RetryableWriteError')
+    return False  # e.g. bson.errors.InvalidDocument: the same update fails the same way every time
+
+
+def _parent_paths(path):
+    i = path.find('.')
+    while i != -1:
+        yield path[:i]
+        i = path.find('.', i + 1)
+
+
+def _merge_updates(older, newer):
+    """
+    Coalesce two update documents of the same _id into one, as if both had been applied in order. None when they
+    can't be one document: the same field under two operators, or a field next to one of its subfields, which
+    MongoDB rejects as conflicting paths.
+    """
+    ops, parents = {}, set()
+    for op, fields in older.items():
+        for path in fields:
+            ops[path] = op
+            parents.update(_parent_paths(path))
+    for op, fields in newer.items():
+        for path in fields:
+            if ops.get(path, op) != op or path in parents or any(p in ops for p in _parent_paths(path)):
+                return None
+
+    merged = {op: dict(fields) for op, fields in older.items()}
+    for op, fields in newer.items():
+        current = merged.setdefault(op, {})
+        if op == '$setOnInsert':  # only the first insert counts
+            for k, v in fields.items():
+                current.setdefault(k, v)
+        elif op == '$inc':
+            for k, v in fields.items():
+                current[k] = current.get(k, 0) + v
+        else:
+            current.update(fields)
+    return merged
+
 
 class StatusMonitor:
+    """
+    Save service status and stats to MongoDB.
+
+    Monitors built from a uri share the process-wide client of get_mongo_client() for the same uri and options
+    (max_pool_size, timeout in seconds and any other MongoClient keyword argument); after os.fork() the child
+    gets a new one. Pass client to use your own.
 
-    def __init__(self, uri=None, switch=False):
-        if not uri:
+    With write_behind=True, save() only buffers: updates are coalesced per document (the latest $set of a field
+    wins) and written by a background thread with one bulk_write per collection, every flush_interval seconds or
+    as soon as flush_size documents are pending. Updates that can't be coalesced (the same field under two
+    operators, a field and its subfield) are kept apart and written one after the other. Buffered updates are
+    flushed by flush(), close() and at exit; reads don't see them before that. Past max_buffer pending documents,
+    overflow decides: 'block' has save() flush by itself (so it waits on MongoDB, for as long as it is down),
+    'drop' drops the updates of documents not already pending. Dropped updates, and the ones that failed for good
+    (not a network or failover error), are counted in `dropped`.
+    The background thread and the exit hook hold on to a write-behind monitor until close(): create one per
+    process (or service) and close() it rather than creating and dropping many.
+
+    load_categories() is cached for categories_ttl seconds. Run ensure_indexes() once per collection so load() and
+    delete() by category and time range don't scan the whole collection.
+    """
+
+    def __init__(self, uri=None, switch=False, client=None, write_behind=False, flush_interval=5.0, flush_size=500,
+                 max_buffer=10000, categories_ttl=60, max_pool_size=None, timeout=None, overflow='block',
+                 **client_options):
+        if not uri and client is None:
             raise ValueError('Missing MongoDB URI')
-        self.mdb = pymongo.MongoClient(uri)
+        if overflow not in _OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow!r}, expected one of {_OVERFLOW_POLICIES}')
+        self.uri = uri
+        self._client = client
+        self._client_options = None
+        if client is None:
+            if max_pool_size is not None:
+                client_options['maxPoolSize'] = max_pool_size
+            if timeout is not None:
+                timeout_ms = int(timeout * 1000)
+                client_options.setdefault('serverSelectionTimeoutMS', timeout_ms)
+                client_options.setdefault('connectTimeoutMS', timeout_ms)
+                client_options.setdefault('socketTimeoutMS', timeout_ms)
+            self._client_options = client_options
+        self._pid = None
+        self._connect()  # get the client now, so a bad uri still fails here
         self.switch = switch
         self.start_timestamp = datetime.now().timestamp()
         self.status_id = ObjectId()
         self.stats_id = ObjectId()
 
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_buffer = max_buffer
+        self.overflow = overflow
+        self.dropped = 0
+        self._pending = {}  # (db_name, collection_name, _id) -> update documents, in order, none of them mergeable
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time, so an older update never lands after a newer one
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = None
+        self._heartbeat = None
+        self._heartbeat_stop = None
+        self.categories_ttl = categories_ttl
+        self._categories = {}  # (db_name, collection_name) -> (expires, categories)
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name='StatusMonitor-flusher', daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
+    def _connect(self):
+        """Return the client, a new one in a forked child: a MongoClient must not be shared across fork()."""
+        if self._client_options is not None and self._pid != os.getpid():
+            self._client = get_mongo_client(self.uri, **self._client_options)
+            self._pid = os.getpid()
+        return self._client
+
+    @property
+    def mdb(self):
+        return self._connect()
+
     @classmethod
     def new_id(cls):
         return ObjectId()
@@ -63,6 +232,7 @@ class StatusMonitor:
 
         if delete_condition:
             result = self.mdb[db_name][collection_name].delete_many(delete_condition)
+            self._categories.pop((db_name, collection_name), None)
             _logger.info(f'Deleted {result.deleted_count} status/stats with condition: {delete_condition}\n')
         else:
             _logger.info('No condition specified for deletion.\n')
@@ -71,14 +241,133 @@ class StatusMonitor:
         if not self.switch or not category or not data:
             return
 
-        # _logger.info(f'Saving status/stats for {category}.')
-        _id = id if id else self.stats_id
-        self.mdb[db_name][collection_name].update_one(
-            {'_id': _id},
-            {'$set': {**data, 'category': category, 'update_time': datetime.now(pytz.utc)}},
-            upsert=True
-        )
-        _logger.info(f'Saved status/stats for {category}, id({_id}): {data}\n')
+        self._save(category, data, id if id else self.stats_id, collection_name, db_name)
+
+    def _save(self, category, data, _id, collection_name, db_name, on_insert=None):
+        cached = self._categories.get((db_name, collection_name))
+        if cached and category not in cached[1]:
+            self._categories.pop((db_name, collection_name), None)  # a new category, refresh on next load
+        update = {'$set': {**data, 'category': category, 'update_time': datetime.now(pytz.utc)}}
+        if on_insert:
+            update['$setOnInsert'] = on_insert
+        self._update(_id, update, collection_name, db_name)
+        _logger.debug(f'Saved status/stats for {category}, id({_id}): {data}\n')
+
+    def _update(self, _id, update, collection_name, db_name):
+        """Upsert one document, right away or through the write-behind buffer."""
+        if not self.write_behind or self._closed:
+            self.mdb[db_name][collection_name].update_one({'_id': _id}, update, upsert=True)
+            return
+
+        key = (db_name, collection_name, _id)
+        with self._lock:
+            updates = self._pending.get(key)
+            if updates is None:
+                if len(self._pending) >= self.max_buffer and self.overflow == 'drop':
+                    self.dropped += 1
+                    return
+                self._pending[key] = [update]
+            else:
+                merged = _merge_updates(updates[-1], update)
+                if merged is None:
+                    updates.append(update)
+                else:
+                    updates[-1] = merged
+            size = len(self._pending)
+        if size >= self.max_buffer and self.overflow == 'block':
+            self.flush()  # the flusher can't keep up, write from the caller
+        elif size >= self.flush_size:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                _logger.error(f'Failed to flush status/stats: {e}')
+
+    def flush(self):
+        """
+        Write the buffered updates, one bulk_write per collection (and one more per round of updates that couldn't
+        be coalesced). Writes that failed on a network, failover or timeout error go back to the buffer, only those,
+        so a retried $inc is not counted twice; other failures are logged and counted in `dropped`.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            by_collection = {}
+            for (db_name, collection_name, _id), updates in pending.items():
+                by_collection.setdefault((db_name, collection_name), []).append((_id, updates))
+
+            for (db_name, collection_name), queued in by_collection.items():
+                retry = self._write(self.mdb[db_name][collection_name], f'{db_name}.{collection_name}', queued)
+                if retry:
+                    self._requeue(db_name, collection_name, retry)
+
+    def _write(self, collection, name, queued):
+        """Write the first update of every queued _id, then the next ones; return the (_id, updates) to retry."""
+        retry = []
+        while queued:
+            try:
+                collection.bulk_write([UpdateOne({'_id': _id}, updates[0], upsert=True) for _id, updates in queued],
+                                      ordered=False)
+                errors = {}
+            except BulkWriteError as e:  # unordered: everything but the write errors went through
+                errors = {error['index']: error for error in e.details.get('writeErrors', ())}
+            except Exception as e:
+                if _is_retryable(e):
+                    _logger.error(f'Failed to write {len(queued)} status/stats to {name}, will retry: {e}')
+                    return retry + queued
+                if len(queued) > 1:  # one by one, so only the bad update is dropped
+                    for item in queued:
+                        retry += self._write(collection, name, [item])
+                    return retry
+                errors = {0: {'code': None, 'errmsg': str(e)}}
+
+            next_round = []
+            for i, (_id, updates) in enumerate(queued):
+                error = errors.get(i)
+                if error is not None and error.get('code') in _RETRYABLE_CODES:
+                    _logger.error(f"Failed to write an update of {_id} to {name}, will retry: {error.get('errmsg')}")
+                    retry.append((_id, updates))  # the later updates of _id wait behind the failed one
+                    continue
+                if error is not None:
+                    _logger.error(f"Dropped an update of {_id} in {name}: {error.get('errmsg')}")
+                    with self._lock:
+                        self.dropped += 1
+                if len(updates) > 1:
+                    next_round.append((_id, updates[1:]))
+            queued = next_round
+        return retry
+
+    def _requeue(self, db_name, collection_name, retry):
+        dropped = 0
+        with self._lock:
+            for _id, updates in retry:
+                key = (db_name, collection_name, _id)
+                newer = self._pending.get(key)
+                if newer:
+                    merged = _merge_updates(updates[-1], newer[0])
+                    self._pending[key] = updates + newer if merged is None else updates[:-1] + [merged] + newer[1:]
+                elif len(self._pending) < self.max_buffer:
+                    self._pending[key] = updates
+                else:
+                    dropped += len(updates)
+            self.dropped += dropped
+        if dropped:
+            _logger.error(f'Dropped {dropped} status/stats updates to {db_name}.{collection_name}: buffer is full')
+
+    def close(self):
+        """Stop the heartbeat and the background flusher, write what is still buffered."""
+        self.stop_heartbeat()
+        if self._flusher and not self._closed:
+            self._closed = True
+            self._wakeup.set()
+            self._flusher.join()
+            atexit.unregister(self.close)
+        self.flush()
 
     def delete_status(self, id=None, collection_name=_COLLECTION_NAME, db_name=_DB_NAME):
         self.delete(id=id if id else self.status_id, collection_name=collection_name, db_name=db_name)
@@ -93,26 +382,235 @@ class StatusMonitor:
 
         _id = id if id else self.status_id
         data = {'service': service_name, 'status': status}
+        # start_time only lands when the upsert inserts, no find_one round-trip needed
+        self._save(CAT_SERVICE_STATUS, data, _id, collection_name, db_name,
+                   on_insert={'start_time': datetime.fromtimestamp(start_timestamp, tz=pytz.utc)})
+
+    def start_heartbeat(self, service_name, interval=60, status='running', id=None,
+                        collection_name=_COLLECTION_NAME, db_name=_DB_NAME):
+        """
+        Call save_status() now and then every interval seconds from a background thread, until stop_heartbeat().
+        status may be a callable returning the current status.
+        """
+        self.stop_heartbeat()
+        stop = self._heartbeat_stop = threading.Event()
+
+        def beat():
+            next_time = time.monotonic()
+            while True:
+                try:
+                    self.save_status(service_name, status() if callable(status) else status, id,
+                                     collection_name=collection_name, db_name=db_name)
+                except Exception as e:
+                    _logger.error(f'Failed to save status of {service_name}: {e}')
+                next_time += interval
+                now = time.monotonic()
+                if next_time < now:  # a slow save or a suspended process: skip the missed beats, don't burst them
+                    next_time = now + interval
+                if stop.wait(next_time - now):
+                    return
+
+        self._heartbeat = threading.Thread(target=beat, name=f'StatusMonitor-heartbeat-{service_name}', daemon=True)
+        self._heartbeat.start()
 
-        if not self.mdb[db_name][collection_name].find_one({'_id': _id}):  # not exists, insert with start time
-            data['start_time'] = datetime.fromtimestamp(start_timestamp, tz=pytz.utc)
+    def stop_heartbeat(self):
+        if self._heartbeat:
+            self._heartbeat_stop.set()
+            self._heartbeat.join()
+            self._heartbeat = None
 
-        self.save(CAT_SERVICE_STATUS, data, _id, collection_name, db_name)
+    def ensure_indexes(self, collection_name=_COLLECTION_NAME, db_name=_DB_NAME):
+        """Create the (category, update_time) index that load() and delete() filter on. A no-op if it exists."""
+        return self.mdb[db_name][collection_name].create_index(
+            [('category', pymongo.ASCENDING), ('update_time', pymongo.ASCENDING)], name='category_update_time')
 
-    def load(self, category, start=None, end=None, collection_name=_COLLECTION_NAME, db_name=_DB_NAME):
+    def iter_load(self, category, start=None, end=None, collection_name=_COLLECTION_NAME, db_name=_DB_NAME,
+                  fields=None, sort=None, limit=0, batch_size=1000):
+        """
+        Like load(), but yields the documents as the cursor fetches them, batch_size at a time.
+        fields limits the returned fields (_id is always included), sort is a field name or a list of
+        (field, direction) pairs, limit 0 means no limit. Projection, sort and limit all run on the server.
+        """
         if not category:
-            return []
+            return
         if not start:
             start = datetime.now(pytz.utc) - timedelta(days=7)
         if not end:
             end = datetime.now(pytz.utc)
         condition = {'category': category, 'update_time': {'$gte': start, '$lt': end}}
-        result = self.mdb[db_name][collection_name].find(condition)
-        return list(result)
+        projection = dict.fromkeys(fields, 1) if fields else None
+        if isinstance(sort, str):
+            sort = [(sort, pymongo.ASCENDING)]
+        cursor = self.mdb[db_name][collection_name].find(condition, projection, sort=sort, limit=limit,
+                                                         batch_size=batch_size)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def load(self, category, start=None, end=None, collection_name=_COLLECTION_NAME, db_name=_DB_NAME,
+             fields=None, sort=None, limit=0):
+        return list(self.iter_load(category, start, end, collection_name, db_name,
+                                   fields=fields, sort=sort, limit=limit))
+
+    def aggregate(self, category, fields, start=None, end=None, interval='daily', collection_name=_COLLECTION_NAME,
+                  db_name=_DB_NAME):
+        """
+        Reduce the numeric fields of a category per time bucket on the server, instead of load()-ing every document.
+
+        Args:
+            category: Category to aggregate.
+            fields: Numeric fields saved with the category.
+            start, end: First and last day (inclusive, UTC), "yyyy-MM-dd" strings, dates or datetimes.
+                        Default to the last 7 days.
+            interval: Bucket size, any interval of generate_time_ranges() ('daily', 'weekly', 'monthly', ...
+                      or a number of days); the buckets are exactly the ranges it generates.
+
+        Returns:
+            list: One dict per bucket, empty buckets included, e.g.
+                  {'start': datetime, 'end': datetime (exclusive), 'count': 24,
+                   'done': {'sum': 1200, 'min': 3, 'max': 97, 'last': 97}, ...}
+        """
+        if not category or not fields:
+            return []
+        if not end:
+            end = datetime.now(pytz.utc)
+        if not start:
+            start = (end if isinstance(end, datetime) else dateutil_parser.parse(str(end))) - timedelta(days=6)
+        starts, ends = time_range_ordinals(start, end, interval)
+        if not starts:
+            return []
+        boundaries = [datetime.fromordinal(o).replace(tzinfo=pytz.utc) for o in starts]
+        boundaries.append(datetime.fromordinal(ends[-1] + 1).replace(tzinfo=pytz.utc))
+
+        # output names can't contain dots, so fields (e.g. 'stats.done') are numbered here and mapped back below
+        output = {'count': {'$sum': 1}}
+        for i, field in enumerate(fields):
+            for stat in _BUCKET_STATS:
+                output[f'f{i}__{stat}'] = {f'${stat}': f'${field}'}
+        pipeline = [
+            {'$match': {'category': category, 'update_time': {'$gte': boundaries[0], '$lt': boundaries[-1]}}},
+            {'$sort': {'update_time': 1}},  # served by the (category, update_time) index, gives $last its meaning
+            {'$bucket': {'groupBy': '$update_time', 'boundaries': boundaries,
+                         'output': output}},
+        ]
+        # pymongo hands back naive UTC datetimes unless the client is tz_aware
+        by_start = {doc['_id'].replace(tzinfo=None): doc
+                    for doc in self.mdb[db_name][collection_name].aggregate(pipeline)}
+
+        buckets = []
+        for bucket_start, bucket_end in zip(boundaries, boundaries[1:]):
+            doc = by_start.get(bucket_start.replace(tzinfo=None), {})
+            bucket = {'start': bucket_start, 'end': bucket_end, 'count': doc.get('count', 0)}
+            for i, field in enumerate(fields):
+                bucket[field] = {stat: doc.get(f'f{i}__{stat}') for stat in _BUCKET_STATS}
+            buckets.append(bucket)
+        return buckets
+
+    def load_categories(self, collection_name=_COLLECTION_NAME, db_name=_DB_NAME, refresh=False):
+        """Sorted distinct categories, cached for categories_ttl seconds unless refresh is True."""
+        key = (db_name, collection_name)
+        cached = self._categories.get(key)
+        if cached and not refresh and cached[0] > time.monotonic():
+            return list(cached[1])
+        categories = sorted(self.mdb[db_name][collection_name].distinct('category'))
+        if self.categories_ttl:
+            self._categories[key] = (time.monotonic() + self.categories_ttl, categories)
+        return list(categories)
+
+
+class CounterExporter:
+    """
+    Push a logging_utils.Counter (or ShardedCounter) to a StatusMonitor category every interval seconds, from a
+    background thread.
+
+    Only the keys that changed since the last push are written: with mode='inc' as $inc deltas, so the document
+    keeps totals across restarts (a value going down is taken as a reset, its delta restarts from 0), with
+    mode='set' as $set of the current values. With rates=True the rate of each changed key goes along under
+    'rates.<key>'. inc() is never blocked, the counter is only copied. A failed push is retried with the next one,
+    a slow or failing one doubles the wait up to max_interval.
+    """
+
+    def __init__(self, counter, monitor, category, interval=60, id=None, mode='inc', rates=True, max_interval=600,
+                 collection_name=_COLLECTION_NAME, db_name=_DB_NAME):
+        if mode not in ('inc', 'set'):
+            raise ValueError(f"Unsupported mode {mode}, expected 'inc' or 'set'")
+        self.counter = counter
+        self.monitor = monitor
+        self.category = category
+        self.interval = interval
+        self.max_interval = max_interval
+        self.id = id if id else ObjectId()
+        self.mode = mode
+        self.rates = rates
+        self.collection_name = collection_name
+        self.db_name = db_name
+        self._values = {}  # values as of the last successful push
+        self._rates = {}
+        self._lock = threading.Lock()  # one push at a time, or two could send the same $inc delta
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'CounterExporter-{self.category}', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread and push what changed since the last push."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.push()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        wait = self.interval
+        while not self._stop.wait(wait):
+            started = time.monotonic()
+            try:
+                self.push()
+                slow = time.monotonic() - started > self.interval / 2
+            except Exception as e:
+                _logger.error(f'Failed to export counter to {self.category}: {e}')
+                slow = True
+            wait = min(wait * 2, self.max_interval) if slow else self.interval
+
+    def push(self):
+        """Write the changed keys now, return the number of keys written."""
+        if not self.monitor.switch:
+            return 0
+        with self._lock:
+            return self._push()
+
+    def _push(self):
+        values = self.counter.copy()
+        changed = {k: v for k, v in values.items() if self._values.get(k) != v}
+        rates = {}
+        if self.rates:
+            rates = {f'rates.{k}': round(r['rate'], 3) for k, r in self.counter.rates().items()}
+            rates = {k: v for k, v in rates.items() if self._rates.get(k) != v}
+        if not changed and not rates:
+            return 0
 
-    def load_categories(self, collection_name=_COLLECTION_NAME, db_name=_DB_NAME):
-        categories = self.mdb[db_name][collection_name].distinct('category')
-        return sorted(categories)
+        update = {'$set': {**rates, 'category': self.category, 'update_time': datetime.now(pytz.utc)}}
+        if self.mode == 'set':
+            update['$set'].update(changed)
+        elif changed:
+            update['$inc'] = {k: v - self._values.get(k, 0) if v >= self._values.get(k, 0) else v
+                              for k, v in changed.items()}
+        self.monitor._update(self.id, update, self.collection_name, self.db_name)
+        self._values = values
+        self._rates.update(rates)
+        return len(changed)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,126 @@
+"""In-process pymongo stand-ins shared by the tests and the StatusMonitor benchmarks."""
+import collections
+
+from pymongo.errors import AutoReconnect, BulkWriteError, WriteError
+
+
+def _get_path(doc, path):
+    for key in path.split('.'):
+        if not isinstance(doc, dict) or key not in doc:
+            return None
+        doc = doc[key]
+    return doc
+
+
+def _conflict(update):
+    """The conflicting path of an update document, like the server reports it (code 40), else None."""
+    paths = sorted(path for fields in update.values() for path in fields)
+    for a, b in zip(paths, paths[1:]):
+        if a == b or b.startswith(a + '.'):
+            return a
+    return None
+
+
+class FakeCollection:
+    """In-process stand-in for the few pymongo collection methods StatusMonitor uses."""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = []
+        self.fail_ids = {}  # _id -> error code bulk_write() reports for it, like an unordered bulk write
+        self.down = False  # every write raises AutoReconnect
+
+    def _apply(self, _id, update, upsert):
+        doc = self.docs.get(_id)
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[_id] = {'_id': _id, **update.get('$setOnInsert', {})}
+        doc.update(update.get('$set', {}))
+        for k, v in update.get('$inc', {}).items():
+            doc[k] = doc.get(k, 0) + v
+
+    def update_one(self, filter, update, upsert=False):
+        self.calls.append('update_one')
+        if self.down:
+            raise AutoReconnect('fake connection refused')
+        if _conflict(update):
+            raise WriteError(f'Updating the path {_conflict(update)!r} would create a conflict', 40)
+        self._apply(filter['_id'], update, upsert)
+
+    def bulk_write(self, requests, ordered=True):
+        self.calls.append('bulk_write')
+        if self.down:
+            raise AutoReconnect('fake connection refused')
+        errors = []
+        for i, request in enumerate(requests):
+            if request._filter['_id'] in self.fail_ids:
+                errors.append({'index': i, 'code': self.fail_ids[request._filter['_id']], 'errmsg': 'fake write error'})
+            elif _conflict(request._doc):
+                errors.append({'index': i, 'code': 40, 'errmsg': f'Updating the path {_conflict(request._doc)!r} '
+                                                                 'would create a conflict'})
+            else:
+                self._apply(request._filter['_id'], request._doc, request._upsert)
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': []})
+
+    def find_one(self, filter):
+        self.calls.append('find_one')
+        return self.docs.get(filter['_id'])
+
+    def find(self, filter, projection=None, sort=None, limit=0, batch_size=0):
+        self.calls.append('find')
+        time_range = filter['update_time']
+        docs = [doc for doc in self.docs.values() if doc.get('category') == filter['category']
+                and time_range['$gte'] <= doc['update_time'] < time_range['$lt']]
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        if limit:
+            docs = docs[:limit]
+        if projection:
+            docs = [{k: v for k, v in doc.items() if k == '_id' or k in projection} for doc in docs]
+        return FakeCursor(docs)
+
+    def aggregate(self, pipeline):
+        """Just the $match / $sort / $bucket pipeline of StatusMonitor.aggregate()."""
+        self.calls.append('aggregate')
+        match, sort, bucket = pipeline[0]['$match'], pipeline[1]['$sort'], pipeline[2]['$bucket']
+        if any('.' in name for name in bucket['output']):
+            raise ValueError("FieldPath field names may not contain '.'")  # what the server says
+        docs = self.find(match, sort=list(sort.items()))
+        self.calls.pop()
+        boundaries = bucket['boundaries']
+        results = []
+        for lower, upper in zip(boundaries, boundaries[1:]):
+            group = [doc for doc in docs if lower <= doc['update_time'] < upper]
+            if not group:
+                continue
+            result = {'_id': lower}
+            for name, accumulator in bucket['output'].items():
+                (op, field), = accumulator.items()
+                values = [1 if field == 1 else _get_path(doc, field[1:]) for doc in group]
+                values = [v for v in values if v is not None]
+                result[name] = {'$sum': sum, '$min': min, '$max': max, '$last': lambda v: v[-1]}[op](values)
+            results.append(result)
+        return results
+
+    def distinct(self, key):
+        self.calls.append('distinct')
+        return list({doc[key] for doc in self.docs.values() if key in doc})
+
+    def create_index(self, keys, name=None):
+        self.calls.append('create_index')
+        return name
+
+
+class FakeCursor(list):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeMongoClient(dict):
+    def __missing__(self, db_name):
+        db = self[db_name] = collections.defaultdict(FakeCollection)
+        return db
@@ -1,8 +1,15 @@
 # run the test by running `python -m unittest tests/test.py`
 
+import collections
+import logging
+import subprocess
+import sys
 import unittest
 from datetime import datetime
+
+import stool
 from stool import first_day_of_month
+from tests.fakes import FakeMongoClient
 
 
 # write some code to test functions in stool/core.py
@@ -11,3 +18,830 @@ class TestCore(unittest.TestCase):
         f = first_day_of_month(datetime(2020, 2, 15))
         print(f)
         self.assertEqual(f, datetime(2020, 2, 1))
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_counter_does_not_import_heavy_modules(self):
+        code = "import sys, stool; stool.Counter; print(' '.join(sorted(sys.modules)))"
+        modules = set(subprocess.check_output([sys.executable, '-c', code], text=True).split())
+        self.assertIn('stool.logging_utils', modules)
+        self.assertFalse(modules & {'pymongo', 'bson', 'requests'})
+
+    def test_exports_cover_public_names(self):
+        for module_name in stool._SUBMODULES:
+            module = getattr(stool, module_name)
+            for name, value in vars(module).items():
+                if not name.startswith('_') and getattr(value, '__module__', None) == module.__name__:
+                    self.assertEqual(stool._EXPORTS.get(name), module_name, name)
+                    self.assertIs(getattr(stool, name), value)
+
+
+class TestShardedCounter(unittest.TestCase):
+    def test_matches_counter(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from stool import Counter, ShardedCounter
+
+        plain, sharded = Counter(), ShardedCounter()
+
+        def worker(i):
+            for c in (plain, sharded):
+                c.inc('total')
+                c.inc(f'worker-{i % 3}', 2)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(worker, range(1000)))
+        self.assertEqual(sharded.copy(), dict(plain))
+        self.assertEqual(sharded.get('total'), 1000)
+        self.assertIn('worker-0', sharded)
+        self.assertEqual(sharded.to_str(), plain.to_str())
+
+        sharded.set('total', 5)
+        self.assertEqual(sharded.inc('total'), 1)  # this thread's own total since set()
+        self.assertEqual(sharded.inc('total', 2), 3)
+        self.assertEqual(sharded['total'], 8)
+        sharded.reset()
+        self.assertFalse(sharded)
+        sharded.inc('x')
+        self.assertEqual(dict(sharded.items()), {'x': 1})
+
+    def test_inc_many_and_merge(self):
+        import collections
+        import pickle
+        from stool import Counter, ShardedCounter
+
+        for cls in (Counter, ShardedCounter):
+            c = cls()
+            c.inc_many({'total': 1, 'bytes': 100})
+            c.inc_many({'total': 1, 'bytes': 50})
+            worker = pickle.loads(pickle.dumps(cls(total=3, ok=2)))
+            self.assertIs(c.merge(worker, collections.Counter(ok=1)), c)
+            self.assertEqual(c.copy(), {'total': 5, 'bytes': 150, 'ok': 3})
+
+    def test_rates_and_eta(self):
+        import time
+        from stool import Counter
+
+        c = Counter(total=100)
+        c.timestamp = time.time() - 10
+        c.set_target('total', 300)
+        r = c.rates()['total']
+        self.assertAlmostEqual(r['avg'], 10, places=1)
+        self.assertAlmostEqual(r['eta'], 20, places=0)
+
+        c.rate_window = 5  # window rate now comes from the snapshot taken above
+        c._snapshots[0] = (time.time() - 2, {'total': 100})
+        c.inc('total', 100)
+        self.assertAlmostEqual(c.rates()['total']['rate'], 50, places=0)
+        self.assertIn('/s avg', repr(c))
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_and_merge(self):
+        import pickle
+        from stool import Histogram
+
+        h = Histogram()
+        for v in range(1, 1001):
+            h.record('latency', v)
+        s = h.stats('latency')
+        self.assertEqual((s['count'], s['min'], s['max']), (1000, 1, 1000))
+        for q, expected in ((50, 500), (90, 900), (99, 990)):
+            self.assertAlmostEqual(s[f'p{q}'], expected, delta=expected * 0.01)
+
+        other = pickle.loads(pickle.dumps(h))
+        h.merge(other)
+        self.assertEqual(h.count('latency'), 2000)
+        self.assertEqual(h.percentile('latency', 50), s['p50'])
+
+        h.record('latency', float('inf'))
+        h.record('latency', float('nan'))
+        self.assertEqual((h.count('latency'), h.skipped, h.stats('latency')['max']), (2001, 1, float('inf')))
+        self.assertGreater(h.percentile('latency', 100), 2 ** 38)  # the last bucket
+
+        with h.time('block'):
+            pass
+        self.assertEqual(h.count('block'), 1)
+        self.assertIn('p99=', h.to_str())
+
+
+class TestAsyncLogging(unittest.TestCase):
+    def test_queue_handler_writes_everything_on_flush(self):
+        import io
+        from concurrent.futures import ThreadPoolExecutor
+        from stool import flush_logger, get_colored_logger
+        from stool.logging_utils import _THREAD_COLORS
+
+        logger = get_colored_logger('test-async', queue_size=10)
+        stream = io.StringIO()
+        logger.handlers[0].listener.handlers[0].setStream(stream)
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix='worker') as executor:
+            list(executor.map(lambda i: logger.info('message %d', i), range(200)))
+        flush_logger(logger)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 200)
+        self.assertTrue(all(any(color + 'message' in line for color in _THREAD_COLORS) for line in lines))
+
+    def test_drop_policy_counts_drops(self):
+        import threading
+        from stool.logging_utils import _AsyncQueueHandler
+
+        release = threading.Event()
+
+        class SlowHandler(logging.Handler):
+            def emit(self, record):
+                release.wait()
+
+        handler = _AsyncQueueHandler(SlowHandler(), 2, overflow='drop')
+        logger = logging.getLogger('test-async-drop')
+        logger.propagate = False
+        logger.addHandler(handler)
+        for i in range(10):
+            logger.warning('message %d', i)
+        self.assertGreaterEqual(handler.dropped, 7)
+        release.set()
+        handler.flush()
+        logger.removeHandler(handler)
+        handler.close()
+
+    def test_formatter_leaves_record_msg_alone(self):
+        from stool.logging_utils import _ThreadColorFormatter
+
+        formatter = _ThreadColorFormatter(fmt='%(thread_color)s%(message)s')
+        record = logging.makeLogRecord({'msg': 'value %s', 'args': (42,)})
+        first, second = formatter.format(record), formatter.format(record)
+        self.assertEqual(record.msg, 'value %s')
+        self.assertEqual(first, second)
+        self.assertIn('value 42', first)
+
+    def test_json_lines_to_rotated_file(self):
+        import json
+        import os
+        import tempfile
+        from stool import flush_logger, get_colored_logger
+
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'log.jsonl')
+            logger = get_colored_logger('test-json', json_lines=True, file=file, max_bytes=1000, backup_count=3)
+            for i in range(20):
+                logger.info('item %d', i, extra={'when': datetime(2024, 1, 2, 3, 4, 5), 'domain': 'example.com'})
+            flush_logger(logger)
+            self.assertTrue(os.path.exists(file + '.1'))
+            with open(file, encoding='utf-8') as f:
+                record = json.loads(f.readlines()[-1])
+            logger.handlers[0].close()
+        self.assertEqual(record['msg'], 'item 19')
+        self.assertEqual((record['level'], record['logger'], record['thread']), ('INFO', 'test-json', -1))
+        self.assertEqual(record['when'], '2024-01-02T03:04:05')
+        self.assertEqual(record['domain'], 'example.com')
+        datetime.fromisoformat(record['ts'])
+
+    def test_json_lines_through_queue_keep_exc(self):
+        import io
+        import json
+        from stool import flush_logger, get_colored_logger
+
+        logger = get_colored_logger('test-json-queue', json_lines=True, queue_size=10)
+        stream = io.StringIO()
+        logger.handlers[0].listener.handlers[0].setStream(stream)
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception('failed %s', 'job')
+        flush_logger(logger)
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record['msg'], 'failed job')
+        self.assertIn('ZeroDivisionError', record['exc'])
+
+    def test_rotation_counts_bytes(self):
+        import os
+        import tempfile
+        from stool.logging_utils import _BufferedRotatingFileHandler
+
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = _BufferedRotatingFileHandler(os.path.join(tmp, 'log.txt'), max_bytes=100, backup_count=1)
+            for _ in range(3):
+                handler.emit(logging.makeLogRecord({'msg': '日志' * 10}))  # 61 bytes, 21 characters per line
+            handler.close()
+            self.assertEqual(os.path.getsize(os.path.join(tmp, 'log.txt')), 61)
+
+
+class TestDateUtils(unittest.TestCase):
+    def test_iter_time_ranges_matches_generate_time_ranges(self):
+        from datetime import date
+        from stool import generate_time_ranges, iter_time_ranges, time_range_ordinals
+
+        for start, end in (('2023-12-31', '2024-01-01'), ('2020-02-15', '2023-11-03'), ('2024-03-31', '2024-03-31')):
+            for interval in ('daily', 'weekly', 'monthly', 'quarterly', 'yearly', 3, '5'):
+                expected = generate_time_ranges(start, end, interval)
+                self.assertEqual(list(iter_time_ranges(start, end, interval)), expected)
+                starts, ends = time_range_ordinals(start, end, interval)
+                self.assertEqual([(date.fromordinal(s).isoformat(), date.fromordinal(e).isoformat())
+                                  for s, e in zip(starts, ends)], expected)
+        self.assertEqual(next(iter_time_ranges('2024-02-10', '2024-05-01', as_type=date)),
+                         (date(2024, 2, 10), date(2024, 2, 29)))
+
+    def test_parse_date_fast_path_and_cache(self):
+        from datetime import timezone
+        from dateutil import parser as dateutil_parser
+        from stool import parse_date, parse_dates, tz_it
+
+        for s in ('2024-01-02', '2024-01-02T10:11:12Z', '2024-01-02 10:11:12.5+08:00', 'Jan 5 2024', '01/02/2024'):
+            self.assertEqual(parse_date(s), tz_it(dateutil_parser.parse(s)))
+        self.assertEqual(parse_date('2024-01-02T10:00:00+02:00').tzinfo, timezone.utc)
+
+        stats = {}
+        dates = parse_dates(['2031-05-06T07:08:09'] * 4, stats=stats)
+        self.assertEqual(dates[0], datetime(2031, 5, 6, 7, 8, 9, tzinfo=timezone.utc))
+        self.assertEqual((stats['total'], stats['cache_hits']), (4, 3))
+        self.assertEqual(stats['hit_rate'], 0.75)
+
+    def test_parse_dates_with_inferred_format(self):
+        from datetime import timedelta, timezone
+        from stool import infer_date_format, parse_date, parse_dates
+
+        strs = [(datetime(2024, 1, 1) + timedelta(hours=37 * i)).strftime('%a, %d %b %Y %H:%M:%S +0200')
+                for i in range(50)]
+        self.assertEqual(infer_date_format(strs), '%a, %d %b %Y %H:%M:%S %z')
+        self.assertEqual(infer_date_format(['2024-01-02T03:04:05Z']), 'iso8601')
+        stats = {}
+        dates = parse_dates(strs + ['05 Jan 2024', 'not a date'], infer_format=True, stats=stats)
+        self.assertEqual(dates[:50], [parse_date(s) for s in strs])
+        self.assertEqual(dates[50:], [datetime(2024, 1, 5, tzinfo=timezone.utc), None])
+        self.assertEqual(stats, {'total': 52, 'fallbacks': 2, 'failed': 1})
+
+    def test_tz_it_many_matches_tz_it(self):
+        from datetime import timedelta, timezone
+        from stool import tz_it, tz_it_many
+
+        dts = [datetime(2023, 1, 1, tzinfo=timezone.utc) + timedelta(hours=7 * i) for i in range(3000)]
+        dts += [datetime(2024, 3, 10, 7, 0), datetime(2024, 11, 3, 5, 59, 59), None]  # naive, around the DST switches
+        for tz in ('America/New_York', 'Asia/Shanghai', None):
+            expected = [tz_it(d, tz) for d in dts]
+            converted = tz_it_many(dts, tz)
+            self.assertEqual([str(d) for d in converted], [str(d) for d in expected])
+            epochs = [d and tz_it(d).timestamp() for d in dts]
+            self.assertEqual(tz_it_many(epochs, tz, output='epoch'),
+                             [d and (d.replace(tzinfo=None) - datetime(1970, 1, 1)).total_seconds() for d in expected])
+
+
+class TestDelBySize(unittest.TestCase):
+    def test_dry_run_then_delete(self):
+        import os
+        import tempfile
+        from stool import del_by_size
+
+        with tempfile.TemporaryDirectory() as root:
+            for d in ('', 'a', 'a/b', 'c'):
+                os.makedirs(os.path.join(root, d), exist_ok=True)
+                for name, size in (('small.html', 10), ('big.html', 5000), ('small.htm', 10), ('small.txt', 10)):
+                    with open(os.path.join(root, d, name), 'wb') as f:
+                        f.write(b'x' * size)
+            expected = (8, 4 * 5010, 4, 40)
+
+            calls = []
+            self.assertEqual(del_by_size(root, ext=('.html', '.htm'), dry_run=True,
+                                         progress=lambda done, total: calls.append((done, total))),
+                             (12, 4 * 5020, 8, 80))
+            self.assertEqual([done for done, _ in calls], [1, 2, 3, 4])
+            self.assertEqual(calls[-1], (4, 4))
+            self.assertEqual(del_by_size(root, workers=1, dry_run=True), expected)
+            self.assertEqual(del_by_size(root), expected)
+            self.assertEqual(del_by_size(root), (4, 4 * 5000, 0, 0))
+            self.assertTrue(os.path.exists(os.path.join(root, 'a/b/small.htm')))
+
+
+class TestJsonl(unittest.TestCase):
+    def test_round_trip_append_and_atomic_save(self):
+        import os
+        import tempfile
+        from stool import JsonlWriter, iter_jsonl, save_jsonl
+
+        records = [{'id': i, 'name': f'页面 {i}', 'at': datetime(2024, 1, 1, i)} for i in range(10)]
+        with tempfile.TemporaryDirectory() as root:
+            for name in ('dump.jsonl', 'dump.jsonl.gz'):
+                path = os.path.join(root, name)
+                self.assertEqual(save_jsonl(iter(records[:6]), path), 6)
+                with JsonlWriter(path, append=True, buffer_size=10) as writer:
+                    writer.write_many(records[6:])
+                self.assertEqual(list(iter_jsonl(path)), records)
+                self.assertEqual(next(iter_jsonl(path, datetimes=False))['at'], '2024-01-01T00:00:00')
+
+                with self.assertRaises(RuntimeError), JsonlWriter(path) as writer:
+                    writer.write({'id': 'partial'})
+                    raise RuntimeError('crash')
+                self.assertEqual(len(list(iter_jsonl(path))), 10)
+            self.assertEqual(sorted(os.listdir(root)), ['dump.jsonl', 'dump.jsonl.gz'])
+
+            path = os.path.join(root, 'dump.jsonl')
+            writer = JsonlWriter(path)
+            writer.write({'id': 'lost'})
+            writer._file.write = lambda text: 1 / 0  # e.g. disk full on the last write
+            with self.assertRaises(ZeroDivisionError):
+                writer.close()
+            writer.close()
+            self.assertEqual(len(list(iter_jsonl(path))), 10)
+            self.assertEqual(sorted(os.listdir(root)), ['dump.jsonl', 'dump.jsonl.gz'])
+
+            with open(os.path.join(root, 'dump.jsonl'), 'a', encoding='utf-8') as f:
+                f.write('{"id": 10, "na')
+            with self.assertRaises(ValueError):
+                list(iter_jsonl(os.path.join(root, 'dump.jsonl')))
+            self.assertEqual(len(list(iter_jsonl(os.path.join(root, 'dump.jsonl'), skip_invalid=True))), 10)
+
+
+class TestKeyProjection(unittest.TestCase):
+    def test_matches_the_functions(self):
+        from stool import KeyProjection, exclude_keys, exclude_keyword, reserve_keys, reserve_keyword
+
+        data = {'id': 1, 'password': 'x', 'api_token': 'y', 'name': 'n', 'user_name': 'u', 3: 'int key'}
+        self.assertEqual(KeyProjection(exclude=['id', 3])(data), exclude_keys(data, ['id', 3]))
+        self.assertEqual(KeyProjection(exclude=['id'], mask='***')(data), exclude_keys(data, ['id'], mask='***'))
+        self.assertEqual(KeyProjection(reserve=('id', 'name'))(data), reserve_keys(data, ('id', 'name')))
+        del data[3]
+        self.assertEqual(KeyProjection(exclude_keywords='name')(data), exclude_keyword(data, 'name'))
+        self.assertEqual(KeyProjection(reserve_keywords=['name'])(data), reserve_keyword(data, 'name'))
+        data[3] = 'int key'  # never matches a keyword
+
+        projection = KeyProjection(exclude_keywords=['password', 'token'], mask='***')
+        self.assertEqual(projection(data)['api_token'], '***')
+        self.assertEqual(projection(data)[3], 'int key')
+        # a single str is one key, not a set of characters
+        self.assertNotIn('password', exclude_keys(data, 'password'))
+        self.assertEqual(exclude_keys(data, 'password', mask='***')['password'], '***')
+        self.assertEqual(reserve_keys(data, 'name'), {'name': 'n'})
+        self.assertEqual(KeyProjection(exclude='password', mask='***')(data)['password'], '***')
+        self.assertEqual(KeyProjection(reserve='name')(data), {'name': 'n'})
+
+        small_cache = KeyProjection(exclude=['a'], mask=0, max_cached=1)
+        for _ in range(2):
+            self.assertEqual(small_cache({'b': 1, 'a': 2, 'c': 3}), {'b': 1, 'a': 0, 'c': 3})
+
+    def test_recursive_and_lazy(self):
+        from stool import KeyProjection
+
+        projection = KeyProjection(exclude=['secret'], reserve_keywords=['name', 'items', 'value'],
+                                   recursive=True)
+        records = ({'name': i, 'secret': 's', 'other': 1, 'items': [{'secret': 1, 'value': 2}, 'text']}
+                   for i in range(3))
+        projected = projection.apply_many(records)
+        self.assertNotIsInstance(projected, list)
+        self.assertEqual(next(projected), {'name': 0, 'items': [{'value': 2}, 'text']})
+        self.assertEqual(len(list(projected)), 2)
+
+
+class TestDeepGet(unittest.TestCase):
+    def test_paths_indices_and_wildcards(self):
+        from stool import DeepPath, compile_path, deep_get, deep_get_columns
+
+        record = {'data': {'items': [{'id': 1, 'tags': ['a']}, {'id': 2, 'tags': ['b', 'c']}, {'id': None}],
+                           '0': 'key', 'empty': None}}
+        self.assertEqual(deep_get(record, 'data.items.1.id'), 2)
+        self.assertEqual(deep_get(record, ['data', 'items', -1, 'id'], 'none'), 'none')
+        self.assertEqual(deep_get(record, 'data.0'), 'key')
+        self.assertEqual(deep_get(record, 'data.items.--1.id', 'default'), 'default')
+        self.assertEqual(deep_get(record, 'data.items.5.id', 'missing'), 'missing')
+        self.assertEqual(deep_get(record, 'data.empty', 'default'), 'default')
+        self.assertEqual(deep_get(record, 'data.items.id', 'default'), 'default')
+        self.assertEqual(deep_get(record, 'data.items.*.id', wildcard=True), [1, 2])
+        self.assertEqual(deep_get(record, 'data.items.*.tags.*', wildcard=True), ['a', 'b', 'c'])
+        self.assertEqual(deep_get(record, 'data.nothing.*', [], wildcard=True), [])
+        self.assertEqual(deep_get({'*': {'a': 1}, 'b': 2}, '*.a'), 1)  # a plain key unless wildcard=True
+        self.assertEqual(deep_get(record, 'data.items.*.id', 'default'), 'default')
+        self.assertIs(compile_path('data.items.0'), compile_path('data.items.0'))
+
+        records = [record, {'data': {'items': [{'id': 7}]}}, None]
+        columns = deep_get_columns(iter(records), ['data.items.0.id', DeepPath('data.0')], default=-1)
+        self.assertEqual(list(columns.values()), [[1, 7, -1], ['key', -1, -1]])
+
+
+class TestDateTimeDecoder(unittest.TestCase):
+    def test_precheck_matches_fromisoformat(self):
+        import json
+        from stool import DateTimeDecoder
+
+        values = ['2024-01-02', '2024-01-02T03:04:05.123456+08:00', '2024-01-02 03:04', '20240102', '2024W015',
+                  '2024-W01-5', '2024-13-01', '2024/01/02', '1234567', '12345', 'hello world', 'https://x.y/2024-01-02',
+                  ' 2024-01-02', '２０２４-01-02', '', '2024-01-02T25:00']
+        for value in values:
+            try:
+                expected = datetime.fromisoformat(value)
+            except ValueError:
+                expected = value
+            self.assertEqual(json.loads(json.dumps({'v': value}), cls=DateTimeDecoder)['v'], expected, value)
+
+    def test_keys_and_no_shared_state(self):
+        from stool import DateTimeDecoder, from_json
+
+        text = '{"created": "2024-01-02", "title": "2024-01-02", "items": [{"created": "2024-01-03"}]}'
+        self.assertEqual(from_json(text, keys={'created'}),
+                         {'created': datetime(2024, 1, 2), 'title': '2024-01-02',
+                          'items': [{'created': datetime(2024, 1, 3)}]})
+        self.assertIsInstance(from_json(text)['title'], datetime)
+
+        self.assertIs(DateTimeDecoder(), DateTimeDecoder())
+        self.assertIsNot(DateTimeDecoder(keys=['a']), DateTimeDecoder(keys=['a']))
+        obj = {'at': '2024-01-02'}
+        self.assertEqual(DateTimeDecoder().object_hook(obj), {'at': datetime(2024, 1, 2)})
+        self.assertEqual(obj, {'at': '2024-01-02'})
+
+
+class TestJsonBackends(unittest.TestCase):
+    """Every installed backend must give exactly what the stdlib gives."""
+
+    def setUp(self):
+        import enum
+        from stool import misc_utils
+
+        self.misc_utils = misc_utils
+        self.previous = misc_utils._json_backend
+        aware = datetime(2024, 10, 27, 10, 30, 0, 123456, tzinfo=stool.timezone(stool.timedelta(hours=8)))
+        floats = [0.1, 123.456789, -0.0, 1e-4, 1e-5, -1.5e-7, 3e-9, 1e15, 1e16, 1.5e17, 1e300, 5e-324, 2.5, -3.14159]
+        self.docs = [
+            {'name': 'Example 页面 😀 "quoted" \\ / \x1f\x7f\u2028', 'utc': datetime(2024, 10, 27, 10, 30), 'aware': aware,
+             'nested': {'list': [1, -2, 2 ** 63, True, False, None, [], {}], 'tuple': (1, 'a'), 'empty': ''},
+             'floats': floats},
+            [{'id': i, 'price': i * 1.2345, 'at': datetime(2024, 1, 1, i % 24), 'none': None} for i in range(50)],
+            {'big': 2 ** 70, 'neg_big': -2 ** 64},
+            {'large_floats': [1e16, 1.5e17, -1e300]},
+            {'nan': float('nan'), 'inf': [float('inf'), float('-inf')]},
+            {1: 'int key', 'ordered': collections.OrderedDict(b=1, a=2),
+             'level': enum.IntEnum('Level', 'LOW HIGH').HIGH},
+            'just a string', 42, 1e-05, None,
+        ]
+
+    def tearDown(self):
+        self.misc_utils._json_backend = self.previous
+
+    def backends(self):
+        from stool import set_json_backend
+
+        for name in ('json', 'orjson'):
+            try:
+                set_json_backend(name)
+            except ImportError:
+                continue
+            with self.subTest(backend=name):
+                yield name
+
+    def outputs(self):
+        import json
+        import os
+        import tempfile
+        from stool import CustomJSONEncoder, from_json, iter_jsonl, save_jsonl, to_json
+
+        docs = self.docs + [{'duration': stool.timedelta(hours=25, milliseconds=5), 'at': datetime(2024, 1, 2)}]
+        result = []
+        for doc in self.docs:
+            for indent in (2, None, 4):
+                text = to_json(doc, indent=indent)
+                result += [text, repr(from_json(text))]
+        for doc in docs:
+            result.append(json.dumps(doc, cls=CustomJSONEncoder, indent=2))
+            result.append(json.dumps(doc, cls=CustomJSONEncoder, indent=2, ensure_ascii=False))
+        result.append(repr(from_json('[1e400, NaN, "\\ud800", 123456789012345678901234567890, "2024-01-01"]')))
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'docs.jsonl')
+            save_jsonl([d for d in self.docs if isinstance(d, dict) and 1 not in d], path)
+            with open(path, encoding='utf-8') as f:
+                result.append(f.read())
+            result.append(repr(list(iter_jsonl(path))))
+        return result
+
+    def test_backends_match_stdlib(self):
+        expected = None
+        for name in self.backends():
+            outputs = self.outputs()
+            if expected is None:
+                expected = outputs
+            for want, got in zip(expected, outputs):
+                self.assertEqual(want, got)
+
+    def test_uuid_and_enum_are_left_to_default(self):
+        import enum
+        import uuid
+        from stool import to_json
+
+        color = enum.Enum('Color', 'RED GREEN').RED
+        for _ in self.backends():
+            for value in (uuid.uuid4(), color, [{'nested': color}]):
+                with self.assertRaises(TypeError):
+                    to_json({'value': value})
+
+    def test_circular_reference(self):
+        from stool import to_json
+
+        doc = {'items': []}
+        doc['items'].append(doc)
+        for _ in self.backends():
+            with self.assertRaisesRegex(ValueError, 'Circular reference'):
+                to_json(doc)
+
+    def test_custom_encoder_rounds_floats(self):
+        import json
+        from stool import CustomJSONEncoder
+
+        for _ in self.backends():
+            self.assertEqual(json.dumps({'a': 1.23456, 'b': [0.987654, 2], 'c': float('inf')}, cls=CustomJSONEncoder),
+                             '{"a": 1.23, "b": [0.99, 2], "c": Infinity}')
+            self.assertEqual(json.dumps({'a': 1.23456}, cls=CustomJSONEncoder, indent=2), '{\n  "a": 1.23\n}')
+
+
+class TestNotifier(unittest.TestCase):
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        paths = self.paths = []
+        failures = self.failures = [0]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                paths.append(self.path)
+                self.send_response(500 if failures[0] else 200)
+                failures[0] = max(0, failures[0] - 1)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}/key/'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_escapes_and_retries(self):
+        from stool import Notifier
+
+        notifier = Notifier(self.endpoint, timeout=2, backoff=0.01)
+        self.failures[0] = 2
+        notifier.send('50% done/ok?', title='job #1')
+        self.assertTrue(notifier.flush(5))
+        notifier.close()
+        self.assertEqual(self.paths, ['/key/job%20%231/50%25%20done%2Fok%3F'] * 3)
+
+    def test_after_close_and_on_errors(self):
+        from stool import Notifier
+
+        notifier = Notifier(self.endpoint, timeout=2)
+        deliver = notifier._deliver
+        notifier._deliver = lambda title, message: 1 / 0 if message == 'bad' else deliver(title, message)
+        notifier.send('bad', title='t')
+        notifier.send('good', title='t2')
+        self.assertTrue(notifier.flush(5))  # the sender thread survived the ZeroDivisionError
+        notifier.close()
+        notifier.send('late', title='t3')  # delivered right away, not queued for the stopped thread
+        self.assertTrue(notifier.flush(5))
+        self.assertEqual(self.paths, ['/key/t2/good', '/key/t3/late'])
+
+    def test_bursts_become_digests(self):
+        from urllib.parse import unquote
+        from stool import Notifier
+
+        notifier = Notifier(self.endpoint, timeout=2, rate_limit=1, window=60)
+        for i in range(20):
+            notifier.send(f'error {i}', title='crawler')
+        notifier.close()  # delivers the rest straight away
+        self.assertLessEqual(len(self.paths), 2)
+        messages = unquote(self.paths[-1].split('/')[-1])
+        self.assertIn('error 19', messages)
+        self.assertTrue(messages.startswith(f'{20 - (len(self.paths) - 1)} messages:'))
+
+
+class TestStatusMonitor(unittest.TestCase):
+    def test_write_behind_coalesces_per_id(self):
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True, write_behind=True, flush_interval=60)
+        collection = client['reeval']['status_monitor']
+        for i in range(100):
+            monitor.save('crawler', {'done': i, f'key{i % 3}': i}, id=f'worker-{i % 3}')
+        self.assertEqual(collection.calls, [])
+
+        monitor.close()
+        self.assertEqual(collection.calls, ['bulk_write'])
+        self.assertEqual(len(collection.docs), 3)
+        self.assertEqual(collection.docs['worker-0']['done'], 99)
+        self.assertEqual(collection.docs['worker-2']['key2'], 98)
+        monitor.save('crawler', {'done': 100}, id='worker-0')  # closed: written straight away
+        self.assertEqual(collection.calls, ['bulk_write', 'update_one'])
+
+    def test_write_behind_retries_only_failed_writes(self):
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True, write_behind=True, flush_interval=60)
+        collection = client['reeval']['status_monitor']
+        collection.fail_ids.update(b=91, d=11000)  # ShutdownInProgress is retried, a duplicate key is not
+        for _id in ('a', 'b', 'c', 'd'):
+            monitor._update(_id, {'$inc': {'done': 1}}, 'status_monitor', 'reeval')
+        monitor.flush()
+        self.assertEqual(sorted(collection.docs), ['a', 'c'])
+        self.assertEqual(monitor.dropped, 1)
+
+        collection.fail_ids.clear()
+        monitor.close()
+        self.assertEqual({_id: doc['done'] for _id, doc in collection.docs.items()}, {'a': 1, 'b': 1, 'c': 1})
+
+    def test_write_behind_keeps_conflicting_updates_apart(self):
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True, write_behind=True, flush_interval=60)
+        collection = client['reeval']['status_monitor']
+        for update in ({'$set': {'n': 1}, '$setOnInsert': {'m': 0}}, {'$inc': {'n': 2}}, {'$set': {'m': 5}},
+                       {'$set': {'s': {}}}, {'$set': {'s.x': 1}}):
+            monitor._update('x', update, 'status_monitor', 'reeval')
+        monitor.close()
+        self.assertEqual(monitor.dropped, 0)
+        self.assertEqual(collection.calls, ['bulk_write'] * 3)  # n: $set then $inc, m with $inc, s then s.x
+        self.assertEqual((collection.docs['x']['n'], collection.docs['x']['m']), (3, 5))
+
+    def test_write_behind_overflow(self):
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True, write_behind=True, flush_interval=60, max_buffer=2,
+                                overflow='drop')
+        collection = client['reeval']['status_monitor']
+        collection.down = True
+        for i in range(1, 4):
+            monitor.save('crawler', {'done': i}, id=i)
+        monitor.save('crawler', {'done': 10}, id=1)  # already pending: still coalesced
+        self.assertEqual((collection.calls, monitor.dropped), ([], 1))
+        monitor.flush()  # fails, both documents go back to the buffer
+        collection.down = False
+        monitor.close()
+        self.assertEqual({_id: doc['done'] for _id, doc in collection.docs.items()}, {1: 10, 2: 2})
+        with self.assertRaises(ValueError):
+            StatusMonitor(client=client, overflow='wait')
+
+    def test_write_behind_flushes_on_size(self):
+        import time
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True, write_behind=True, flush_interval=60, flush_size=10)
+        for i in range(10):
+            monitor.save('crawler', {'done': i}, id=i)
+        for _ in range(100):
+            if client['reeval']['status_monitor'].docs:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(client['reeval']['status_monitor'].docs), 10)
+        monitor.close()
+
+    def test_save_status_is_one_upsert(self):
+        import time
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        collection = client['reeval']['status_monitor']
+        monitor = StatusMonitor(client=client, switch=True)
+        monitor.save_status('crawler')
+        start_time = collection.docs[monitor.status_id]['start_time']
+        monitor.start_timestamp += 100
+        monitor.save_status('crawler', 'idle')
+        self.assertEqual(collection.calls, ['update_one', 'update_one'])
+        self.assertEqual(collection.docs[monitor.status_id]['start_time'], start_time)
+        self.assertEqual(collection.docs[monitor.status_id]['status'], 'idle')
+
+        statuses = iter(['a', 'b', 'c', 'd'])
+        monitor.start_heartbeat('crawler', interval=0.01, status=lambda: next(statuses, 'done'))
+        time.sleep(0.1)
+        monitor.stop_heartbeat()
+        self.assertEqual(collection.docs[monitor.status_id]['status'], 'done')
+
+        beats = []
+
+        def slow_first_status():
+            beats.append(time.monotonic())
+            if len(beats) == 1:
+                time.sleep(0.35)  # misses three beats, which must not all fire at once afterwards
+            return 'running'
+
+        monitor.start_heartbeat('crawler', interval=0.1, status=slow_first_status)
+        time.sleep(0.6)
+        monitor.stop_heartbeat()
+        self.assertTrue(all(b - a >= 0.05 for a, b in zip(beats, beats[1:])), beats)
+
+    def test_aggregate_buckets(self):
+        from stool import StatusMonitor, generate_time_ranges
+
+        client = FakeMongoClient()
+        monitor = StatusMonitor(client=client, switch=True)
+        collection = client['reeval']['status_monitor']
+        for i, day in enumerate((1, 1, 2, 9, 9, 20)):
+            monitor.save('crawler', {'done': i, 'stats': {'done': i * 10}}, id=f'doc-{i}')
+            collection.docs[f'doc-{i}']['update_time'] = datetime(2024, 3, day, 12, tzinfo=stool.pytz.utc)
+
+        buckets = monitor.aggregate('crawler', ['done'], '2024-03-01', '2024-03-21', interval='weekly')
+        self.assertEqual(collection.calls[-1], 'aggregate')
+        self.assertEqual([(b['start'].strftime('%Y-%m-%d'), (b['end'] - stool.timedelta(days=1)).strftime('%Y-%m-%d'))
+                          for b in buckets], generate_time_ranges('2024-03-01', '2024-03-21', 'weekly'))
+        self.assertEqual([b['count'] for b in buckets], [3, 2, 1])
+        self.assertEqual(buckets[0]['done'], {'sum': 3, 'min': 0, 'max': 2, 'last': 2})
+        self.assertEqual(buckets[1]['done'], {'sum': 7, 'min': 3, 'max': 4, 'last': 4})
+
+        buckets = monitor.aggregate('crawler', ['done', 'stats.done'], '2024-03-01', '2024-03-07')
+        self.assertEqual(buckets[0]['stats.done'], {'sum': 10, 'min': 0, 'max': 10, 'last': 10})
+        self.assertEqual(buckets[0]['done'], {'sum': 1, 'min': 0, 'max': 1, 'last': 1})
+
+        buckets = monitor.aggregate('crawler', ['done'], '2024-02-20', '2024-03-05', interval='monthly')
+        self.assertEqual([b['count'] for b in buckets], [0, 3])
+        self.assertEqual(buckets[0]['done'], {'sum': None, 'min': None, 'max': None, 'last': None})
+
+    def test_shared_client(self):
+        import os
+        from stool import StatusMonitor, close_mongo_clients
+
+        uri = 'mongodb://localhost:1'
+        first = StatusMonitor(uri, connect=False)
+        second = StatusMonitor(uri, connect=False)
+        other = StatusMonitor(uri, connect=False, max_pool_size=5, timeout=2)
+        self.assertIs(first.mdb, second.mdb)
+        self.assertIsNot(first.mdb, other.mdb)
+        self.assertEqual(other.mdb.options.pool_options.max_pool_size, 5)
+        self.assertEqual(other.mdb.options.server_selection_timeout, 2)
+
+        if hasattr(os, 'fork'):
+            parent_client = first.mdb
+            pid = os.fork()
+            if pid == 0:  # child: a new client, still shared
+                os._exit(0 if first.mdb is not parent_client and first.mdb is second.mdb else 1)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            self.assertIs(first.mdb, parent_client)
+
+        close_mongo_clients()
+        self.assertIsNot(StatusMonitor(uri, connect=False).mdb, first.mdb)
+        close_mongo_clients()
+
+    def test_counter_exporter_pushes_changes_only(self):
+        from stool import Counter, CounterExporter, StatusMonitor
+
+        client = FakeMongoClient()
+        collection = client['reeval']['status_monitor']
+        counter = Counter()
+        exporter = CounterExporter(counter, StatusMonitor(client=client, switch=True), 'crawler', id='c', rates=False)
+        counter.inc('done', 3)
+        counter.inc('failed')
+        self.assertEqual(exporter.push(), 2)
+        self.assertEqual(exporter.push(), 0)
+        counter.inc('done', 2)
+        self.assertEqual(exporter.push(), 1)
+        self.assertEqual(collection.calls, ['update_one', 'update_one'])
+        self.assertEqual((collection.docs['c']['done'], collection.docs['c']['failed']), (5, 1))
+
+        counter.reset()  # e.g. a restart: the totals keep growing
+        counter.inc('done')
+        with exporter.start():
+            pass
+        self.assertEqual(collection.docs['c']['done'], 6)
+
+        exporter = CounterExporter(counter, StatusMonitor(client=client, switch=True), 'crawler', id='s', mode='set')
+        exporter.push()
+        self.assertEqual(collection.docs['s']['done'], 1)
+        self.assertIn('rates.done', collection.docs['s'])
+
+    def test_counter_exporter_concurrent_pushes(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from stool import Counter, CounterExporter, StatusMonitor
+
+        client = FakeMongoClient()
+        counter = Counter()
+        exporter = CounterExporter(counter, StatusMonitor(client=client, switch=True), 'crawler', id='c', rates=False)
+
+        def work(i):
+            counter.inc('done')
+            exporter.push()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(work, range(2000)))
+        exporter.push()
+        self.assertEqual(client['reeval']['status_monitor'].docs['c']['done'], 2000)
+
+    def test_iter_load_and_cached_categories(self):
+        from stool import StatusMonitor
+
+        client = FakeMongoClient()
+        collection = client['reeval']['status_monitor']
+        monitor = StatusMonitor(client=client, switch=True)
+        self.assertEqual(monitor.ensure_indexes(), 'category_update_time')
+        for i in range(5):
+            monitor.save('crawler', {'done': i, 'failed': 0}, id=i)
+        monitor.save('parser', {'done': 1}, id='p')
+
+        docs = list(monitor.iter_load('crawler', fields=['done'], sort=[('done', -1)], limit=3))
+        self.assertEqual(docs, [{'_id': 4, 'done': 4}, {'_id': 3, 'done': 3}, {'_id': 2, 'done': 2}])
+        self.assertEqual(len(monitor.load('crawler')), 5)
+
+        self.assertEqual(monitor.load_categories(), ['crawler', 'parser'])
+        self.assertEqual(monitor.load_categories(), ['crawler', 'parser'])
+        self.assertEqual(collection.calls.count('distinct'), 1)
+        monitor.save('fetcher', {'done': 1}, id='f')  # unseen category drops the cache
+        self.assertEqual(monitor.load_categories(), ['crawler', 'fetcher', 'parser'])
+        self.assertEqual(collection.calls.count('distinct'), 2)